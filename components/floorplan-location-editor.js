@@ -111,6 +111,8 @@ export class FloorplanLocationEditor {
         try {
             // Load boxes
             const boxesResponse = await fetch(`/api/store/${this.storeId}/boxes`);
+            // Location saves send this version back, so they fail with 409 if the store changed since
+            window.api.rememberCatalogVersion(this.storeId, boxesResponse);
             if (boxesResponse.ok) {
                 const data = await boxesResponse.json();
                 this.boxes = data.boxes || []; // Extract boxes array from YAML data
@@ -118,6 +120,7 @@ export class FloorplanLocationEditor {
             
             // Load locations
             const locationsResponse = await fetch(`/api/store/${this.storeId}/box-locations`);
+            window.api.rememberCatalogVersion(this.storeId, locationsResponse);
             if (locationsResponse.ok) {
                 const locationsArray = await locationsResponse.json();
                 // Convert array to object with indices as keys
@@ -245,9 +248,7 @@ export class FloorplanLocationEditor {
             
             const response = await fetch(`/api/store/${this.storeId}/update-locations`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
+                headers: window.api.editHeaders(this.storeId, csrfToken),
                 body: JSON.stringify({
                     changes: changes,
                     csrf_token: csrfToken
@@ -255,6 +256,8 @@ export class FloorplanLocationEditor {
             });
             
             if (response.ok) {
+                window.api.rememberCatalogVersion(this.storeId, response);
+                
                 // Update local locations data
                 boxesAtLocation.forEach(boxId => {
                     if (this.locations[boxId]) {
@@ -353,9 +356,7 @@ export class FloorplanLocationEditor {
             
             const response = await fetch(`/api/store/${this.storeId}/update-locations`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
+                headers: window.api.editHeaders(this.storeId, csrfToken),
                 body: JSON.stringify({
                     changes: changes,
                     csrf_token: csrfToken
@@ -363,6 +364,8 @@ export class FloorplanLocationEditor {
             });
             
             if (response.ok) {
+                window.api.rememberCatalogVersion(this.storeId, response);
+                
                 // Update local locations data and locationsByCoords
                 const newCoordKey = `${markerData.newCoords[0]}_${markerData.newCoords[1]}`;
                 
@@ -470,9 +473,7 @@ export class FloorplanLocationEditor {
             
             const response = await fetch(`/api/store/${this.storeId}/update-locations`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
+                headers: window.api.editHeaders(this.storeId, csrfToken),
                 body: JSON.stringify({
                     changes: changes,
                     csrf_token: csrfToken
@@ -480,6 +481,8 @@ export class FloorplanLocationEditor {
             });
             
             if (response.ok) {
+                window.api.rememberCatalogVersion(this.storeId, response);
+                
                 // Process each updated location
                 Object.entries(updatedLocations).forEach(([boxIndex, location]) => {
                     const boxIdInt = parseInt(boxIndex, 10);
@@ -679,9 +682,7 @@ export class FloorplanLocationEditor {
             
             const response = await fetch(`/api/store/${this.storeId}/update-locations`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
+                headers: window.api.editHeaders(this.storeId, csrfToken),
                 body: JSON.stringify({
                     changes: changes,
                     csrf_token: csrfToken
@@ -689,6 +690,8 @@ export class FloorplanLocationEditor {
             });
             
             if (response.ok) {
+                window.api.rememberCatalogVersion(this.storeId, response);
+                
                 // Get coordinate keys
                 const sourceCoordKey = `${this.mergeSource.coords[0]}_${this.mergeSource.coords[1]}`;
                 const destCoordKey = `${this.mergeDestination.coords[0]}_${this.mergeDestination.coords[1]}`;
@@ -994,9 +997,7 @@ export class FloorplanLocationEditor {
             
             const response = await fetch(`/api/store/${this.storeId}/update-locations`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
+                headers: window.api.editHeaders(this.storeId, csrfToken),
                 body: JSON.stringify({
                     changes: changes,
                     csrf_token: csrfToken
@@ -1004,6 +1005,8 @@ export class FloorplanLocationEditor {
             });
             
             if (response.ok) {
+                window.api.rememberCatalogVersion(this.storeId, response);
+                
                 // Get the old location before updating
                 const oldLocation = this.locations[boxIndex];
                 
@@ -1173,9 +1176,7 @@ export class FloorplanLocationEditor {
             
             const response = await fetch(`/api/store/${this.storeId}/update-locations`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
+                headers: window.api.editHeaders(this.storeId, csrfToken),
                 body: JSON.stringify({
                     changes: changes,
                     csrf_token: csrfToken
@@ -1183,6 +1184,8 @@ export class FloorplanLocationEditor {
             });
             
             if (response.ok) {
+                window.api.rememberCatalogVersion(this.storeId, response);
+                
                 // First, remove boxes from their old locations in locationsByCoords
                 selectedBoxes.forEach(boxIndex => {
                     const oldLocation = this.locations[boxIndex];
@@ -367,22 +367,8 @@ export class LocationModal {
             const csrfToken = Math.random().toString(36).substring(2, 15) + 
                              Math.random().toString(36).substring(2, 15);
             
-            // Save to API
-            const response = await fetch(`/api/store/${this.options.storeId}/update-locations`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    changes: changes,
-                    csrf_token: csrfToken
-                })
-            });
-            
-            if (!response.ok) {
-                const errorData = await response.json().catch(() => null);
-                throw new Error(`Failed to save location: ${errorData?.detail || response.statusText}`);
-            }
+            // Save to API (with the catalog version the page loaded, so a stale save gets a 409)
+            await window.api.updateLocations(this.options.storeId, changes, csrfToken);
             
             // If we have an onSave callback, call it to update the UI without tracking this as a pending change
             if (this.options.onSave) {
@@ -418,22 +404,7 @@ export class LocationModal {
                                  Math.random().toString(36).substring(2, 15);
                 
                 // Send API request
-                fetch(`/api/store/${this.options.storeId}/update-locations`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        changes: changes,
-                        csrf_token: csrfToken
-                    })
-                }).then(response => {
-                    if (!response.ok) {
-                        return response.json().then(errorData => {
-                            throw new Error(`Failed to delete location: ${errorData?.detail || response.statusText}`);
-                        });
-                    }
-                    
+                window.api.updateLocations(this.options.storeId, changes, csrfToken).then(() => {
                     // If we have an onClear callback, call it to update the UI without tracking as a pending change
                     if (this.options.onClear) {
                         this.options.onClear(true); // Pass true to indicate this was already saved to API
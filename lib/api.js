@@ -5,6 +5,39 @@
  * the details of the API endpoints and request handling.
  */
 
+// Last catalog version seen per store. Edits send it back in If-Match so the
+// server can reject them with 409 when someone else changed the store meanwhile.
+const catalogVersions = {};
+
+/**
+ * Remembers the catalog version reported by a response
+ * @param {string} storeId - The store ID
+ * @param {Response} response - A response from a store endpoint
+ */
+function rememberCatalogVersion(storeId, response) {
+  const version = response.headers.get('X-Catalog-Version');
+  if (version) {
+    catalogVersions[storeId] = version;
+  }
+}
+
+/**
+ * Headers for an edit request, including If-Match when the catalog version is known
+ * @param {string} storeId - The store ID
+ * @param {string} csrfToken - The CSRF token
+ * @returns {Object} - The request headers
+ */
+function editHeaders(storeId, csrfToken) {
+  const headers = {
+    'Content-Type': 'application/json',
+    'X-CSRF-Token': csrfToken
+  };
+  if (catalogVersions[storeId]) {
+    headers['If-Match'] = `"${catalogVersions[storeId]}"`;
+  }
+  return headers;
+}
+
 /**
  * Fetches the current pricing mode for a store
  * @param {string} storeId - The store ID
@@ -33,6 +66,7 @@ async function fetchPricingMode(storeId) {
 async function fetchBoxes(storeId) {
   try {
     const response = await fetch(`/api/store/${storeId}/boxes`);
+    rememberCatalogVersion(storeId, response);
     if (!response.ok) {
       const errorText = await response.text();
       throw new Error(`Server error: ${response.status} - ${errorText}`);
@@ -52,6 +86,7 @@ async function fetchBoxes(storeId) {
 async function fetchBoxesWithSections(storeId) {
   try {
     const response = await fetch(`/api/store/${storeId}/boxes_with_sections`);
+    rememberCatalogVersion(storeId, response);
     if (!response.ok) {
       throw new Error(`Failed to fetch boxes with sections: ${response.status}`);
     }
@@ -70,6 +105,7 @@ async function fetchBoxesWithSections(storeId) {
 async function fetchAllBoxes(storeId) {
   try {
     const response = await fetch(`/api/store/${storeId}/all_boxes`);
+    rememberCatalogVersion(storeId, response);
     if (!response.ok) {
       throw new Error(`Failed to fetch all boxes: ${response.status}`);
     }
@@ -80,6 +116,72 @@ async function fetchAllBoxes(storeId) {
   }
 }
 
+/**
+ * Fetches server-side packing results for an item
+ * @param {string} storeId - The store ID
+ * @param {Array<number>} dims - The item dimensions [x, y, z] (order doesn't matter)
+ * @param {Object} options - Filters: levels, strategies, showPossible, showNoSpace, showImpossible, scorePriority, limit
+ * @returns {Promise<Array>} - The filtered, sorted BoxResult rows
+ */
+async function fetchPackResults(storeId, dims, options = {}) {
+  try {
+    const params = new URLSearchParams({ x: dims[0], y: dims[1], z: dims[2] });
+    (options.levels || []).forEach(level => params.append('levels', level));
+    (options.strategies || []).forEach(strategy => params.append('strategies', strategy));
+    if (options.showPossible !== undefined) params.set('show_possible', options.showPossible);
+    if (options.showNoSpace !== undefined) params.set('show_no_space', options.showNoSpace);
+    if (options.showImpossible !== undefined) params.set('show_impossible', options.showImpossible);
+    if (options.scorePriority !== undefined) params.set('score_priority', options.scorePriority);
+    if (options.limit !== undefined) params.set('limit', options.limit);
+
+    const response = await fetch(`/api/store/${storeId}/pack?${params}`);
+    if (!response.ok) {
+      throw new Error(`Failed to fetch packing results: ${response.status}`);
+    }
+    const data = await response.json();
+    return data.results;
+  } catch (error) {
+    console.error("Error fetching packing results:", error);
+    throw error;
+  }
+}
+
+/**
+ * Fetches the best packing results for a list of items in one call
+ * @param {string} storeId - The store ID
+ * @param {Array<Array<number>>} items - Item dimensions, one [x, y, z] per item
+ * @param {Object} options - Same filters as fetchPackResults, plus limit (results per item)
+ * @returns {Promise<Array<Array>>} - The BoxResult rows for each item, best first
+ */
+async function fetchPackBatch(storeId, items, options = {}) {
+  try {
+    const body = { items: items };
+    if (options.levels) body.levels = options.levels;
+    if (options.strategies) body.strategies = options.strategies;
+    if (options.showPossible !== undefined) body.show_possible = options.showPossible;
+    if (options.showNoSpace !== undefined) body.show_no_space = options.showNoSpace;
+    if (options.showImpossible !== undefined) body.show_impossible = options.showImpossible;
+    if (options.scorePriority !== undefined) body.score_priority = options.scorePriority;
+    if (options.limit !== undefined) body.limit = options.limit;
+
+    const response = await fetch(`/api/store/${storeId}/pack/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json'
+      },
+      body: JSON.stringify(body)
+    });
+    if (!response.ok) {
+      throw new Error(`Failed to fetch batch packing results: ${response.status}`);
+    }
+    const data = await response.json();
+    return data.results;
+  } catch (error) {
+    console.error("Error fetching batch packing results:", error);
+    throw error;
+  }
+}
+
 /**
  * Updates standard prices for multiple boxes
  * @param {string} storeId - The store ID
@@ -91,10 +193,7 @@ async function updateStandardPrices(storeId, changes, csrfToken) {
   try {
     const response = await fetch(`/api/store/${storeId}/update_prices`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-        'X-CSRF-Token': csrfToken
-      },
+      headers: editHeaders(storeId, csrfToken),
       body: JSON.stringify({
         changes: changes,
         csrf_token: csrfToken
@@ -102,9 +201,12 @@ async function updateStandardPrices(storeId, changes, csrfToken) {
     });
     
     if (!response.ok) {
+      // A 409 means the store changed since it was loaded; the caller should reload
       const errorData = await response.json().catch(() => null);
       throw new Error(`Failed to update prices: ${response.status} - ${errorData?.detail || response.statusText}`);
     }
+
+    rememberCatalogVersion(storeId, response);
     
     return await response.json();
   } catch (error) {
@@ -124,10 +226,7 @@ async function updateItemizedPrices(storeId, changes, csrfToken) {
   try {
     const response = await fetch(`/api/store/${storeId}/update_itemized_prices`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-        'X-CSRF-Token': csrfToken
-      },
+      headers: editHeaders(storeId, csrfToken),
       body: JSON.stringify({
         changes: changes,
         csrf_token: csrfToken
@@ -135,9 +234,12 @@ async function updateItemizedPrices(storeId, changes, csrfToken) {
     });
     
     if (!response.ok) {
+      // A 409 means the store changed since it was loaded; the caller should reload
       const errorData = await response.json().catch(() => null);
       throw new Error(`Failed to update itemized prices: ${response.status} - ${errorData?.detail || response.statusText}`);
     }
+
+    rememberCatalogVersion(storeId, response);
     
     return await response.json();
   } catch (error) {
@@ -181,10 +283,7 @@ async function updateLocations(storeId, changes, csrfToken) {
   try {
     const response = await fetch(`/api/store/${storeId}/update-locations`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-        'X-CSRF-Token': csrfToken
-      },
+      headers: editHeaders(storeId, csrfToken),
       body: JSON.stringify({
         changes: changes,
         csrf_token: csrfToken
@@ -192,9 +291,12 @@ async function updateLocations(storeId, changes, csrfToken) {
     });
     
     if (!response.ok) {
+      // A 409 means the store changed since it was loaded; the caller should reload
       const errorData = await response.json().catch(() => null);
       throw new Error(`Failed to update locations: ${response.status} - ${errorData?.detail || response.statusText}`);
     }
+
+    rememberCatalogVersion(storeId, response);
     
     return await response.json();
   } catch (error) {
@@ -210,10 +312,14 @@ if (typeof window !== 'undefined') {
     fetchBoxes,
     fetchBoxesWithSections,
     fetchAllBoxes,
+    fetchPackResults,
+    fetchPackBatch,
     updateStandardPrices,
     updateItemizedPrices,
     submitComment,
-    updateLocations
+    updateLocations,
+    rememberCatalogVersion,
+    editHeaders
   };
 }
 
@@ -0,0 +1,62 @@
+"""
+Crash-safe file replacement
+
+atomic_write writes to a temporary file in the same directory, fsyncs it and
+then os.replace()s it over the target. Readers either see the old file or the
+complete new one, never a truncated or half-written file, and a crash mid-write
+leaves the original untouched.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w") -> Iterator[IO]:
+    """
+    Open a temporary file that replaces path when the block exits cleanly
+
+    If the block raises, the temporary file is removed and path is left as it was.
+
+    Args:
+        path: File to replace
+        mode: "w" for text or "wb" for binary
+
+    Yields:
+        The open temporary file
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        # mkstemp creates the file as 0600; keep the target's permissions instead
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    # Persist the rename itself
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
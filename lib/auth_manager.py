@@ -24,13 +24,22 @@ import bcrypt
 import secrets
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from contextlib import contextmanager
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import subprocess
 import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    from jose import jwt, JWTError
+except ImportError:  # only needed for SESSION_TOKEN_MODE=signed
+    jwt = None
+
 # Verify xkcdpass is available at import time
 try:
     subprocess.run(['xkcdpass', '--help'], capture_output=True, check=True)
@@ -49,25 +58,76 @@ def get_db_path():
     default_path = str(Path(__file__).resolve().parent.parent / 'db' / 'packingwebsite.db')
     return os.environ.get('SQLITE_DB_PATH', default_path)
 
+# Connection tuning, applied to every new connection. Negative cache sizes are in KiB.
+BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', str(8 * 1024)))
+MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(64 * 1024 * 1024)))
+
+# Each worker thread keeps one connection open per database path instead of
+# connecting on every call. sqlite3 connections may only be used by the thread
+# that created them, which thread-local storage gives us for free.
+_local = threading.local()
+
+def prepare_db_dir():
+    """Create the database's directory if needed; done once at startup, not per connection"""
+    db_dir = os.path.dirname(get_db_path())
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """Open a connection and apply the per-connection settings once"""
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.row_factory = sqlite3.Row
+
+    # WAL only has to fsync at checkpoints to stay consistent; a power cut can lose the
+    # last few commits but never corrupts the database
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    return conn
+
 @contextmanager
 def get_db():
-    """Get a database connection with automatic cleanup"""
+    """
+    Get this thread's database connection
+
+    The connection stays open for the next caller on the same thread. A
+    transaction the block leaves uncommitted is rolled back on exit, just like
+    closing a connection would.
+    """
     db_path = get_db_path()
-    
-    # Ensure the directory exists
-    db_dir = os.path.dirname(db_path)
-    os.makedirs(db_dir, exist_ok=True)
-    
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
+
+    # A forked worker must not share its parent's connections
+    connections = getattr(_local, "connections", None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+        _local.depth = 0
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = _connect(db_path)
+
+    _local.depth += 1
     try:
         yield conn
     finally:
-        conn.close()
+        _local.depth -= 1
+        # Nested blocks share the connection; only the outermost one ends the transaction
+        if _local.depth == 0 and conn.in_transaction:
+            conn.rollback()
 
 def init_db():
     """Initialize the database with required tables"""
+    prepare_db_dir()
+
     with get_db() as db:
+        # Write-ahead logging lets readers (session checks) run while a writer (the audit
+        # log, new sessions) is busy, instead of waiting on it. The mode is stored in the
+        # database file, so setting it once here covers every later connection.
+        db.execute("PRAGMA journal_mode = WAL")
+
         # Stores table - one password per store
         db.execute('''
             CREATE TABLE IF NOT EXISTS store_auth (
@@ -89,6 +149,25 @@ def init_db():
             )
         ''')
         
+        # Logged-out signed tokens, kept until they would have expired anyway
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS revoked_tokens (
+                jti TEXT PRIMARY KEY,
+                store_id TEXT NOT NULL,
+                expires_at TIMESTAMP NOT NULL
+            )
+        ''')
+        db.execute('''
+            CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at
+            ON revoked_tokens (expires_at)
+        ''')
+        
+        # Lets the session sweeper find expired sessions without scanning the table
+        db.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sessions_expires_at
+            ON sessions (expires_at)
+        ''')
+        
         # Audit log for tracking access
         db.execute('''
             CREATE TABLE IF NOT EXISTS audit_log (
@@ -100,6 +179,27 @@ def init_db():
             )
         ''')
         
+        # get_audit_log filters by store and sorts by time; retention scans by time
+        db.execute('''
+            CREATE INDEX IF NOT EXISTS idx_audit_log_store_timestamp
+            ON audit_log (store_id, timestamp)
+        ''')
+        db.execute('''
+            CREATE INDEX IF NOT EXISTS idx_audit_log_timestamp
+            ON audit_log (timestamp)
+        ''')
+        
+        # Daily event counts that old audit_log rows are rolled up into
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS audit_daily (
+                day TEXT NOT NULL,
+                store_id TEXT NOT NULL,
+                action TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (day, store_id, action)
+            )
+        ''')
+        
         db.commit()
 
 def generate_passphrase(words: int = 3) -> str:
@@ -159,6 +259,179 @@ def normalize_password(password: str) -> str:
     # Convert to lowercase and keep only a-z characters
     return ''.join(c for c in password.lower() if 'a' <= c <= 'z')
 
+# bcrypt is deliberately slow (hundreds of milliseconds of CPU per check), so hashing runs
+# on its own small pool instead of the threads that serve every other request. At most
+# BCRYPT_WORKERS checks run at once and BCRYPT_QUEUE_LIMIT more may wait; beyond that new
+# requests are turned away right away with AuthBusyError instead of queueing up.
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', str(min(4, os.cpu_count() or 1))))
+BCRYPT_QUEUE_LIMIT = int(os.environ.get('BCRYPT_QUEUE_LIMIT', '16'))
+
+_hash_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = threading.BoundedSemaphore(BCRYPT_WORKERS + BCRYPT_QUEUE_LIMIT)
+
+class AuthBusyError(RuntimeError):
+    """Raised when too many password checks are already running or queued"""
+
+def submit_hash_job(func, *args) -> Future:
+    """
+    Run a bcrypt call on the hashing pool
+    
+    Returns:
+        A future with the call's result
+    
+    Raises:
+        AuthBusyError: If the pool and its queue are full
+    """
+    if not _hash_slots.acquire(blocking=False):
+        raise AuthBusyError("Too many login attempts in progress, try again shortly")
+    try:
+        future = _hash_executor.submit(func, *args)
+    except BaseException:
+        _hash_slots.release()
+        raise
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return future
+
+def check_password(password: str, password_hash: bytes) -> Future:
+    """
+    Check a password against a stored hash on the hashing pool
+    
+    Returns:
+        A future that resolves to True if the password matches
+    
+    Raises:
+        AuthBusyError: If the pool and its queue are full
+    """
+    # Normalize the password before checking
+    normalized = normalize_password(password)
+    return submit_hash_job(bcrypt.checkpw, normalized.encode('utf-8'), password_hash)
+
+# Audit events are normally written on the caller's thread. While the app runs, the audit
+# writer thread takes them off the request path instead: events go onto an in-memory queue
+# and are inserted in batches of up to AUDIT_BATCH_SIZE rows per transaction, at least every
+# AUDIT_FLUSH_SECONDS. Each event keeps the time it was recorded, not the time it was written.
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '100'))
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', '1'))
+AUDIT_QUEUE_LIMIT = int(os.environ.get('AUDIT_QUEUE_LIMIT', '10000'))
+# What to do with a new event when the queue is full: "block" until the writer catches up,
+# "sync" to write it on the caller's thread, or "drop" it (counted and reported)
+AUDIT_OVERFLOW = os.environ.get('AUDIT_OVERFLOW', 'block')
+
+AUDIT_INSERT = "INSERT INTO audit_log (store_id, action, details, timestamp) VALUES (?, ?, ?, ?)"
+
+_audit_queue: "deque[Tuple[str, str, Optional[str], str]]" = deque()
+_audit_cond = threading.Condition()
+_audit_thread: Optional[threading.Thread] = None
+_audit_stopping = False
+_audit_dropped = 0
+
+def _write_audit_events(events: List[Tuple[str, str, Optional[str], str]]):
+    with get_db() as db:
+        db.executemany(AUDIT_INSERT, events)
+        db.commit()
+
+def log_audit_event(store_id: str, action: str, details: Optional[str] = None):
+    """
+    Record an audit event
+    
+    Queued for the audit writer while it runs, written right away otherwise.
+    
+    Args:
+        store_id: The store the event is about
+        action: What happened, e.g. "login_attempt"
+        details: Optional JSON details
+    """
+    global _audit_dropped
+    # Same format and clock as CURRENT_TIMESTAMP
+    event = (store_id, action, details, datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"))
+
+    with _audit_cond:
+        if _audit_thread is not None:
+            while len(_audit_queue) >= AUDIT_QUEUE_LIMIT and AUDIT_OVERFLOW == "block" and _audit_thread is not None:
+                _audit_cond.wait()
+            if _audit_thread is not None:
+                if len(_audit_queue) < AUDIT_QUEUE_LIMIT:
+                    _audit_queue.append(event)
+                    if len(_audit_queue) >= AUDIT_BATCH_SIZE:
+                        _audit_cond.notify_all()
+                    return
+                if AUDIT_OVERFLOW == "drop":
+                    _audit_dropped += 1
+                    return
+
+    _write_audit_events([event])
+
+def _take_audit_batch() -> List[Tuple[str, str, Optional[str], str]]:
+    # Caller holds _audit_cond
+    batch = []
+    while _audit_queue and len(batch) < AUDIT_BATCH_SIZE:
+        batch.append(_audit_queue.popleft())
+    _audit_cond.notify_all()
+    return batch
+
+def _run_audit_writer():
+    global _audit_dropped
+    while True:
+        with _audit_cond:
+            deadline = time.monotonic() + AUDIT_FLUSH_SECONDS
+            while len(_audit_queue) < AUDIT_BATCH_SIZE and not _audit_stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _audit_cond.wait(remaining)
+            batch = _take_audit_batch()
+            dropped, _audit_dropped = _audit_dropped, 0
+            stopping = _audit_stopping and not _audit_queue
+
+        if dropped:
+            print(f"Audit log queue full: dropped {dropped} events")
+        if batch:
+            try:
+                _write_audit_events(batch)
+            except Exception as e:
+                print(f"Error writing {len(batch)} audit events: {str(e)}")
+        if stopping:
+            return
+
+def start_audit_writer():
+    """Start writing audit events in the background"""
+    global _audit_thread, _audit_stopping
+    with _audit_cond:
+        if _audit_thread is not None:
+            return
+        _audit_stopping = False
+        _audit_thread = threading.Thread(target=_run_audit_writer, name="audit-writer", daemon=True)
+        _audit_thread.start()
+
+def stop_audit_writer():
+    """
+    Write every queued audit event, stop the writer and checkpoint the database
+    
+    Later events are written synchronously again.
+    """
+    global _audit_thread, _audit_stopping
+    with _audit_cond:
+        thread = _audit_thread
+        if thread is None:
+            return
+        _audit_stopping = True
+        _audit_cond.notify_all()
+    thread.join()
+
+    with _audit_cond:
+        _audit_thread = None
+        leftover = list(_audit_queue)
+        _audit_queue.clear()
+        # Wake up anyone blocked on a full queue; they now write synchronously
+        _audit_cond.notify_all()
+    if leftover:
+        _write_audit_events(leftover)
+
+    # With synchronous=NORMAL the last commits may only be in the WAL; a checkpoint
+    # fsyncs them into the database file
+    with get_db() as db:
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
 def create_store_auth(store_id: str, password: Optional[str] = None) -> str:
     """
     Create or update authentication for a store
@@ -175,7 +448,7 @@ def create_store_auth(store_id: str, password: Optional[str] = None) -> str:
     
     # Normalize the password before hashing
     normalized = normalize_password(password)
-    password_hash = bcrypt.hashpw(normalized.encode('utf-8'), bcrypt.gensalt())
+    password_hash = submit_hash_job(bcrypt.hashpw, normalized.encode('utf-8'), bcrypt.gensalt()).result()
     
     with get_db() as db:
         # Check if store already has auth
@@ -211,41 +484,134 @@ def create_store_auth(store_id: str, password: Optional[str] = None) -> str:
     
     return password
 
+def get_password_hash(store_id: str) -> Optional[bytes]:
+    """Return a store's password hash, or None if it has no authentication"""
+    with get_db() as db:
+        result = db.execute(
+            "SELECT password_hash FROM store_auth WHERE store_id = ?",
+            (store_id,)
+        ).fetchone()
+        
+        return result['password_hash'] if result else None
+
+def log_login_attempt(store_id: str, success: bool):
+    """Record a login attempt in the audit log"""
+    log_audit_event(store_id, "login_attempt", json.dumps({"success": success}))
+
 def verify_store_password(store_id: str, password: str) -> bool:
     """
     Verify a password for a store
     
+    Blocks until the hashing pool has checked it; the login route uses
+    get_password_hash, check_password and log_login_attempt directly so it
+    doesn't hold a request thread meanwhile.
+    
     Args:
         store_id: The store identifier
         password: The password to verify
     
     Returns:
         True if password is correct, False otherwise
+    
+    Raises:
+        AuthBusyError: If the hashing pool and its queue are full
     """
+    password_hash = get_password_hash(store_id)
+    if not password_hash:
+        return False
+    
+    is_valid = check_password(password, password_hash).result()
+    
+    # Log the attempt
+    log_login_attempt(store_id, is_valid)
+    
+    return is_valid
+
+# Session tokens are random strings looked up in the sessions table by default. With
+# SESSION_TOKEN_MODE=signed they are JWTs signed with SESSION_SECRET (HS256) that carry the
+# store ID and expiry, so any worker with the secret verifies them with CPU work alone. Only
+# logged-out tokens are remembered, in revoked_tokens; each process keeps that list in memory
+# and re-reads it every REVOCATION_REFRESH_SECONDS, so a logout reaches workers sharing the
+# database within that time.
+SESSION_TOKEN_MODE = os.environ.get('SESSION_TOKEN_MODE', 'db')
+SESSION_SECRET = os.environ.get('SESSION_SECRET', '')
+REVOCATION_REFRESH_SECONDS = float(os.environ.get('REVOCATION_REFRESH_SECONDS', '30'))
+TOKEN_ALGORITHM = "HS256"
+
+if SESSION_TOKEN_MODE not in ("db", "signed"):
+    raise RuntimeError(f"Unknown SESSION_TOKEN_MODE: {SESSION_TOKEN_MODE} (use 'db' or 'signed')")
+if SESSION_TOKEN_MODE == "signed":
+    if jwt is None:
+        raise RuntimeError("SESSION_TOKEN_MODE=signed requires python-jose: pip install python-jose")
+    if len(SESSION_SECRET) < 32:
+        raise RuntimeError("SESSION_TOKEN_MODE=signed requires SESSION_SECRET of at least 32 characters")
+
+# jti -> expiry (epoch seconds) of revoked signed tokens
+_revoked: Dict[str, float] = {}
+_revoked_lock = threading.Lock()
+_revoked_refresh_at = 0.0
+
+def _decode_token(token: str) -> Optional[Dict]:
+    """Return the claims of a valid, unexpired signed token, or None"""
+    try:
+        claims = jwt.decode(token, SESSION_SECRET, algorithms=[TOKEN_ALGORITHM])
+    except JWTError:
+        return None
+    if not isinstance(claims.get("sub"), str) or not claims.get("jti"):
+        return None
+    return claims
+
+def _refresh_revoked():
+    """Re-read the revocation list from the database once REVOCATION_REFRESH_SECONDS have passed"""
+    global _revoked_refresh_at
+    if time.monotonic() < _revoked_refresh_at:
+        return
+    with _revoked_lock:
+        if time.monotonic() < _revoked_refresh_at:
+            return
+        _revoked_refresh_at = time.monotonic() + REVOCATION_REFRESH_SECONDS
+        try:
+            with get_db() as db:
+                rows = db.execute(
+                    "SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > CURRENT_TIMESTAMP"
+                ).fetchall()
+        except sqlite3.Error as e:
+            # Keep the list we have; local logouts are in it already
+            print(f"Error reading revoked tokens: {str(e)}")
+            return
+        for row in rows:
+            expires_at = _parse_timestamp(row['expires_at'])
+            if expires_at is not None:
+                _revoked[row['jti']] = expires_at.replace(tzinfo=timezone.utc).timestamp()
+        # Expired tokens fail verification anyway
+        now = time.time()
+        for jti in [jti for jti, exp in _revoked.items() if exp <= now]:
+            del _revoked[jti]
+
+def _verify_signed_session(token: str) -> Optional[str]:
+    claims = _decode_token(token)
+    if claims is None:
+        return None
+    _refresh_revoked()
+    if claims["jti"] in _revoked:
+        return None
+    return claims["sub"]
+
+def _revoke_signed_session(token: str) -> Optional[str]:
+    """Revoke a signed token, returning its store_id, or None if it wasn't valid"""
+    claims = _decode_token(token)
+    if claims is None:
+        return None
+    with _revoked_lock:
+        _revoked[claims["jti"]] = float(claims["exp"])
+    expires_at = datetime.fromtimestamp(claims["exp"], timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
     with get_db() as db:
-        result = db.execute(
-            "SELECT password_hash FROM store_auth WHERE store_id = ?",
-            (store_id,)
-        ).fetchone()
-        
-        if not result:
-            return False
-        
-        # Normalize the password before checking
-        normalized = normalize_password(password)
-        is_valid = bcrypt.checkpw(
-            normalized.encode('utf-8'), 
-            result['password_hash']
-        )
-        
-        # Log the attempt
         db.execute(
-            "INSERT INTO audit_log (store_id, action, details) VALUES (?, ?, ?)",
-            (store_id, "login_attempt", json.dumps({"success": is_valid}))
+            "INSERT OR IGNORE INTO revoked_tokens (jti, store_id, expires_at) VALUES (?, ?, ?)",
+            (claims["jti"], claims["sub"], expires_at)
         )
         db.commit()
-        
-        return is_valid
+    return claims["sub"]
 
 def create_session(store_id: str, hours: int = 24) -> str:
     """
@@ -258,55 +624,179 @@ def create_session(store_id: str, hours: int = 24) -> str:
     Returns:
         The session token
     """
+    if SESSION_TOKEN_MODE == "signed":
+        now = int(time.time())
+        token = jwt.encode(
+            {"sub": store_id, "iat": now, "exp": now + int(hours * 3600), "jti": secrets.token_urlsafe(16)},
+            SESSION_SECRET,
+            algorithm=TOKEN_ALGORITHM
+        )
+        log_audit_event(store_id, "session_created")
+        return token
+    
     token = secrets.token_urlsafe(32)
     expires_at = datetime.now() + timedelta(hours=hours)
     
+    # Expired sessions are removed by sweep_expired_sessions, not here
     with get_db() as db:
-        # Clean up old sessions first
-        db.execute(
-            "DELETE FROM sessions WHERE expires_at < CURRENT_TIMESTAMP"
-        )
-        
         # Create new session
         db.execute(
             "INSERT INTO sessions (token, store_id, expires_at) VALUES (?, ?, ?)",
             (token, store_id, expires_at)
         )
         
-        # Log the session creation
-        db.execute(
-            "INSERT INTO audit_log (store_id, action) VALUES (?, ?)",
-            (store_id, "session_created")
-        )
-        
         db.commit()
     
+    # Log the session creation
+    log_audit_event(store_id, "session_created")
+    
     return token
 
+# Expired sessions are deleted this many rows per transaction, so a sweep never holds the
+# write lock for long even after a large backlog has built up
+SESSION_SWEEP_CHUNK = int(os.environ.get('SESSION_SWEEP_CHUNK', '500'))
+
+def _delete_expired(table: str, chunk_size: int) -> int:
+    deleted = 0
+    while True:
+        with get_db() as db:
+            count = db.execute(
+                f"""DELETE FROM {table} WHERE rowid IN (
+                        SELECT rowid FROM {table}
+                        WHERE expires_at < CURRENT_TIMESTAMP
+                        LIMIT ?
+                    )""",
+                (chunk_size,)
+            ).rowcount
+            db.commit()
+        deleted += count
+        if count < chunk_size:
+            return deleted
+
+def sweep_expired_sessions(chunk_size: int = SESSION_SWEEP_CHUNK) -> int:
+    """
+    Delete expired sessions in chunks of chunk_size rows
+    
+    Revoked signed tokens that have expired are dropped too.
+    
+    Returns:
+        The number of sessions deleted
+    """
+    deleted = _delete_expired("sessions", chunk_size)
+    _delete_expired("revoked_tokens", chunk_size)
+    return deleted
+
+def count_live_sessions() -> Dict[str, int]:
+    """Return the number of unexpired sessions per store"""
+    with get_db() as db:
+        results = db.execute(
+            """SELECT store_id, COUNT(*) AS sessions FROM sessions
+               WHERE expires_at > CURRENT_TIMESTAMP
+               GROUP BY store_id
+               ORDER BY store_id"""
+        ).fetchall()
+        
+        return {row['store_id']: row['sessions'] for row in results}
+
+# Verified sessions are cached in memory as token -> (store_id, expires_at, cached_until),
+# so authenticated requests skip the database. Entries are re-checked against the database
+# after SESSION_CACHE_TTL seconds, which bounds how long a session deleted by another process
+# (another worker, or the CLI) keeps working here. 0 disables the cache.
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', '60'))
+
+_session_cache: "OrderedDict[str, Tuple[str, datetime, float]]" = OrderedDict()
+_session_cache_lock = threading.Lock()
+
+def _utcnow() -> datetime:
+    # expires_at is compared with CURRENT_TIMESTAMP in SQL, which is UTC
+    return datetime.utcnow()
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+def _cache_session(token: str, store_id: str, expires_at: datetime):
+    if SESSION_CACHE_SIZE <= 0 or SESSION_CACHE_TTL <= 0:
+        return
+    with _session_cache_lock:
+        _session_cache[token] = (store_id, expires_at, time.monotonic() + SESSION_CACHE_TTL)
+        _session_cache.move_to_end(token)
+        while len(_session_cache) > SESSION_CACHE_SIZE:
+            _session_cache.popitem(last=False)
+
+def _cached_session(token: str) -> Optional[str]:
+    with _session_cache_lock:
+        entry = _session_cache.get(token)
+        if entry is None:
+            return None
+        store_id, expires_at, cached_until = entry
+        # The session's own expiry is enforced from the cached timestamp, not the TTL
+        if expires_at <= _utcnow() or cached_until <= time.monotonic():
+            del _session_cache[token]
+            return None
+        _session_cache.move_to_end(token)
+        return store_id
+
+def invalidate_session_cache(token: Optional[str] = None):
+    """Forget one cached session, or all of them when no token is given"""
+    with _session_cache_lock:
+        if token is None:
+            _session_cache.clear()
+        else:
+            _session_cache.pop(token, None)
+
 def verify_session(token: str) -> Optional[str]:
     """
     Verify a session token and return the store_id if valid
     
+    Recently verified tokens are answered from memory until they expire or
+    their cache entry's TTL runs out. Signed tokens are checked against their
+    signature, expiry and the revocation list only.
+    
     Args:
         token: The session token to verify
     
     Returns:
         The store_id if valid, None otherwise
     """
+    if SESSION_TOKEN_MODE == "signed":
+        return _verify_signed_session(token)
+    
+    store_id = _cached_session(token)
+    if store_id is not None:
+        return store_id
+
     with get_db() as db:
         result = db.execute(
-            """SELECT store_id FROM sessions 
+            """SELECT store_id, expires_at FROM sessions 
                WHERE token = ? AND expires_at > CURRENT_TIMESTAMP""",
             (token,)
         ).fetchone()
         
         if result:
+            expires_at = _parse_timestamp(result['expires_at'])
+            if expires_at is not None:
+                _cache_session(token, result['store_id'], expires_at)
             return result['store_id']
         
         return None
 
 def delete_session(token: str):
     """Delete a session (logout)"""
+    if SESSION_TOKEN_MODE == "signed":
+        store_id = _revoke_signed_session(token)
+        if store_id is not None:
+            log_audit_event(store_id, "logout")
+        return
+    
+    # Drop the cached copy first, so the token stops working here even if the delete fails
+    invalidate_session_cache(token)
+
     with get_db() as db:
         # Get store_id for logging
         result = db.execute(
@@ -314,19 +804,15 @@ def delete_session(token: str):
             (token,)
         ).fetchone()
         
-        if result:
-            store_id = result['store_id']
-            
-            # Delete the session
-            db.execute("DELETE FROM sessions WHERE token = ?", (token,))
-            
-            # Log the logout
-            db.execute(
-                "INSERT INTO audit_log (store_id, action) VALUES (?, ?)",
-                (store_id, "logout")
-            )
-            
-            db.commit()
+        if not result:
+            return
+        
+        # Delete the session
+        db.execute("DELETE FROM sessions WHERE token = ?", (token,))
+        db.commit()
+    
+    # Log the logout
+    log_audit_event(result['store_id'], "logout")
 
 def list_stores() -> List[Dict]:
     """List all stores with auth configured"""
@@ -375,5 +861,79 @@ def get_audit_log(store_id: Optional[str] = None, limit: int = 100) -> List[Dict
         
         return [dict(row) for row in results]
 
+# Raw audit_log rows older than this many days are rolled up into audit_daily counts and
+# deleted. Whole days are rolled up, one day per transaction. 0 keeps every row.
+AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', '90'))
+
+def rollup_audit_log(retention_days: int = AUDIT_RETENTION_DAYS) -> int:
+    """
+    Roll audit_log rows older than retention_days into daily counts and delete them
+    
+    Args:
+        retention_days: Age in days past which raw rows are rolled up
+    
+    Returns:
+        The number of rows rolled up
+    """
+    if retention_days <= 0:
+        return 0
+    
+    # Timestamps are stored like CURRENT_TIMESTAMP, so they compare as strings
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime("%Y-%m-%d 00:00:00")
+    
+    rolled_up = 0
+    while True:
+        with get_db() as db:
+            oldest = db.execute(
+                "SELECT MIN(timestamp) AS oldest FROM audit_log WHERE timestamp < ?",
+                (cutoff,)
+            ).fetchone()['oldest']
+            if oldest is None:
+                return rolled_up
+            
+            day_start = oldest[:10] + " 00:00:00"
+            day_end = (datetime.fromisoformat(oldest[:10]) + timedelta(days=1)).strftime("%Y-%m-%d 00:00:00")
+            end = min(day_end, cutoff)
+            
+            db.execute(
+                """INSERT INTO audit_daily (day, store_id, action, count)
+                   SELECT date(timestamp), store_id, action, COUNT(*) FROM audit_log
+                   WHERE timestamp >= ? AND timestamp < ?
+                   GROUP BY date(timestamp), store_id, action
+                   ON CONFLICT (day, store_id, action) DO UPDATE SET count = count + excluded.count""",
+                (day_start, end)
+            )
+            rolled_up += db.execute(
+                "DELETE FROM audit_log WHERE timestamp >= ? AND timestamp < ?",
+                (day_start, end)
+            ).rowcount
+            db.commit()
+
+def get_audit_summary(store_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+    """
+    Get daily audit event counts, newest day first
+    
+    Args:
+        store_id: Optional filter by store
+        limit: Maximum number of rows to return
+    
+    Returns:
+        List of {day, store_id, action, count} rows
+    """
+    with get_db() as db:
+        if store_id:
+            query = """SELECT * FROM audit_daily 
+                      WHERE store_id = ? 
+                      ORDER BY day DESC, action 
+                      LIMIT ?"""
+            results = db.execute(query, (store_id, limit)).fetchall()
+        else:
+            query = """SELECT * FROM audit_daily 
+                      ORDER BY day DESC, store_id, action 
+                      LIMIT ?"""
+            results = db.execute(query, (limit,)).fetchall()
+        
+        return [dict(row) for row in results]
+
 # This module is a library and should not be executed directly.
 # Use tools/manage_auth.py instead for CLI operations.
\ No newline at end of file
@@ -0,0 +1,332 @@
+"""
+Compiled store catalogs
+
+A store file is validated and normalized once per version by compile_store,
+which produces an immutable StoreCatalog snapshot: every box with its model
+resolved (legacy boxes get a synthetic Unknown-... model), dimensions sorted,
+open dimension resolved, prices expanded to the four packing levels and its
+editor section assigned, plus a model -> box index for O(1) lookups. The
+payloads of the read endpoints are built at the same time, as are the packing
+engine's box arrays, so serving them is a lookup instead of a walk over raw
+YAML dicts. The payloads are also encoded to JSON
+once, with a strong ETag derived from the bytes, so unchanged catalogs can be
+answered with 304 Not Modified. Every snapshot carries a version (a hash of the
+store's content) that edits send back to detect conflicting writes.
+
+Snapshots are cached next to the parsed file by store_cache.load_derived and
+shared between requests; nothing in them may be mutated.
+"""
+
+import copy
+import hashlib
+import json
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from lib.packing import BoxCatalog, itemized_to_standard
+
+# Levels in the order of the 4-element prices array
+PRICE_LEVELS = ["standard", "fragile", "custom"]
+
+ITEMIZED_FIELDS = ["box-price", "standard-materials", "standard-services",
+                   "fragile-materials", "fragile-services",
+                   "custom-materials", "custom-services"]
+
+
+class CatalogError(ValueError):
+    """Raised when a store file fails validation"""
+
+
+class CompiledBox(NamedTuple):
+    """One validated box of a store"""
+    index: int                              # position in the store file
+    type: str
+    model: str                              # the configured model, or the synthetic legacy one
+    has_model: bool                         # False for legacy boxes without a model
+    supplier: str
+    dimensions: Tuple[float, float, float]  # as given in the file
+    sorted_dimensions: Tuple[float, float, float]  # largest first
+    open_dim: int                           # index into dimensions
+    prices: Tuple[float, float, float, float]  # [box only, standard, fragile, custom]
+    itemized_prices: Optional[Dict[str, float]]
+    location: Any
+    coords: Optional[List[float]]
+    section: str
+    config: Dict[str, Any]                  # the normalized box as it appears in the file
+
+
+class JsonBody(NamedTuple):
+    """A response body encoded once, with its strong ETag"""
+    body: bytes
+    etag: str
+
+
+class StoreCatalog(NamedTuple):
+    """Immutable snapshot of a store file and its read endpoint payloads"""
+    version: str                            # content hash of the store file's data
+    pricing_mode: str
+    boxes: Tuple[CompiledBox, ...]
+    model_index: Dict[str, Tuple[int, ...]]  # model -> positions of the boxes using it, in file order
+    config: Dict[str, Any]                  # /boxes
+    all_boxes: Dict[str, Any]               # /all_boxes
+    boxes_with_sections: List[Dict[str, Any]]  # /boxes_with_sections
+    box_locations: List[Dict[str, Any]]     # /box-locations
+    box_catalog: BoxCatalog                 # the packing engine's arrays
+    responses: Dict[str, JsonBody]          # encoded payloads by endpoint name
+
+    def find(self, model: str) -> Optional[CompiledBox]:
+        """The first box with the given model, or None"""
+        positions = self.model_index.get(model)
+        return self.boxes[positions[0]] if positions else None
+
+
+def legacy_model(dimensions: List[float]) -> str:
+    """Model name used for boxes that predate the model field"""
+    return f"Unknown-{len(dimensions)}-{dimensions[0]}-{dimensions[1]}-{dimensions[2]}"
+
+
+def get_box_section(model: str, box_type: str = None):
+    """Editor section for a box, based on model patterns or box type"""
+    # First try to categorize based on model if it exists
+    if model and model.strip():
+        if any(model.endswith(suffix) for suffix in ["C-UPS", "C", "Cube"]):
+            return "CUBE"
+        elif any(x in model for x in ["X 4", "X 3", "X 6", "J-11", "J-14", "J-15", "J-16", "SHIRTB"]):
+            return "FLAT & SMALL"
+        elif any(x in model for x in ["J-20", "WREATH", "ST-6", "MIR-3", "MIR-8"]):
+            return "MEDIUM"
+        elif any(x in model for x in ["J-64", "SUITCASE", "VCR", "24 X 18 X 18"]):
+            return "LARGE"
+        else:
+            return "SPECIALTY"
+
+    # If no model or couldn't categorize, use box type
+    if box_type:
+        if box_type == "NormalBox":
+            return "NORMAL"
+        elif box_type == "CustomBox":
+            return "CUSTOM"
+
+    # Fallback
+    return "OTHER"
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def valid_coords(coords: Any) -> bool:
+    """Whether coords is a list of exactly 2 numbers, as validate_box requires"""
+    return isinstance(coords, list) and len(coords) == 2 and all(_is_number(c) for c in coords)
+
+
+def validate_box(i: int, box: Dict[str, Any], pricing_mode: str):
+    """
+    Check the structure of one box entry
+
+    Raises:
+        CatalogError: Describing the first problem found
+    """
+    if "type" not in box:
+        raise CatalogError(f"Box at index {i} missing 'type' field")
+    if ("dimensions" not in box or not isinstance(box["dimensions"], list) or len(box["dimensions"]) != 3
+            or not all(_is_number(d) for d in box["dimensions"])):
+        raise CatalogError(f"Box at index {i} has invalid 'dimensions' (must be list of 3 numbers)")
+
+    # Validate pricing data based on pricing mode
+    if pricing_mode == "standard":
+        if "prices" not in box or not isinstance(box["prices"], list) or len(box["prices"]) != 4:
+            raise CatalogError(f"Box at index {i} has invalid 'prices' (must be list of 4 numbers)")
+        if "itemized-prices" in box:
+            raise CatalogError(f"Box at index {i} has 'itemized-prices' but store is in standard pricing mode")
+    else:  # itemized pricing mode
+        if "itemized-prices" not in box or not isinstance(box["itemized-prices"], dict):
+            raise CatalogError(f"Box at index {i} missing 'itemized-prices' (must be an object)")
+        for field in ITEMIZED_FIELDS:
+            if field not in box["itemized-prices"]:
+                raise CatalogError(f"Box at index {i} missing required field '{field}' in itemized-prices")
+        if "prices" in box:
+            raise CatalogError(f"Box at index {i} has 'prices' but store is in itemized pricing mode")
+
+    if box["type"] == "CustomBox":
+        if "open_dim" not in box:
+            raise CatalogError(f"Box at index {i} is CustomBox but missing 'open_dim' field")
+        if box["open_dim"] not in (0, 1, 2) or isinstance(box["open_dim"], bool):
+            raise CatalogError(f"Box at index {i} has invalid 'open_dim' (must be 0, 1 or 2)")
+
+    # Optional fields validation
+    if "supplier" in box and not isinstance(box["supplier"], str):
+        raise CatalogError(f"Box at index {i} has invalid 'supplier' (must be a string)")
+    if "model" in box and not isinstance(box["model"], str):
+        raise CatalogError(f"Box at index {i} has invalid 'model' (must be a string)")
+    # Location must be a dictionary, string, or empty/missing
+    if "location" in box and box["location"] is not None:
+        if not isinstance(box["location"], (str, dict)):
+            raise CatalogError(f"Box at index {i} has invalid 'location' (must be a dictionary or string)")
+        if isinstance(box["location"], dict):
+            location = box["location"]
+            # If coords are present, validate them
+            if "coords" in location and location["coords"] is not None:
+                coords = location["coords"]
+                if not isinstance(coords, list) or len(coords) != 2:
+                    raise CatalogError(f"Box at index {i} has invalid 'location.coords' (must be a list of 2 numbers)")
+                if not all(_is_number(coord) for coord in coords):
+                    raise CatalogError(f"Box at index {i} has invalid coordinate values (must be numbers)")
+            # We don't use labels anymore, but if present should be a string
+            if "label" in location and location["label"] is not None and not isinstance(location["label"], str):
+                raise CatalogError(f"Box at index {i} has invalid 'location.label' (must be a string)")
+    if "alternate_depths" in box:
+        if not isinstance(box["alternate_depths"], list):
+            raise CatalogError(f"Box at index {i} has invalid 'alternate_depths' (must be a list of numbers)")
+        if not all(_is_number(depth) for depth in box["alternate_depths"]):
+            raise CatalogError(f"Box at index {i} has invalid value in 'alternate_depths' (must be numbers)")
+
+
+def _compile_box(i: int, box: Dict[str, Any], pricing_mode: str) -> CompiledBox:
+    dimensions = tuple(box["dimensions"])
+    model = box["model"] if "model" in box else legacy_model(box["dimensions"])
+    itemized = box.get("itemized-prices") if pricing_mode != "standard" else None
+    prices = itemized_to_standard(itemized) if itemized is not None else box["prices"]
+
+    location = box.get("location", "???")
+    coords = None
+    if isinstance(location, dict) and location.get("coords"):
+        coords = location["coords"]
+
+    return CompiledBox(
+        index=i,
+        type=box["type"],
+        model=model,
+        has_model="model" in box,
+        supplier=box.get("supplier", "Unknown"),
+        dimensions=dimensions,
+        sorted_dimensions=tuple(sorted(dimensions, reverse=True)),
+        # NormalBox assumes the last dimension is the open dimension
+        open_dim=box["open_dim"] if box["type"] == "CustomBox" else 2,
+        prices=tuple(prices),
+        itemized_prices=itemized,
+        location=location,
+        coords=coords,
+        section=get_box_section(model, box["type"]),
+        config=box
+    )
+
+
+def _section_row(box: CompiledBox, pricing_mode: str) -> Dict[str, Any]:
+    """Row of the price editor table"""
+    row = {
+        "section": box.section,
+        "model": box.model,
+        "dimensions": "x".join(str(d) for d in box.dimensions),
+        "box_price": box.prices[0]
+    }
+    if pricing_mode == "standard":
+        row.update({"standard": box.prices[1], "fragile": box.prices[2], "custom": box.prices[3]})
+    else:
+        for level, total in zip(PRICE_LEVELS, box.prices[1:]):
+            row[f"{level}_materials"] = box.itemized_prices[f"{level}-materials"]
+            row[f"{level}_services"] = box.itemized_prices[f"{level}-services"]
+            row[f"{level}_total"] = total
+    row["location"] = box.location
+    row["pricing_mode"] = pricing_mode
+    return row
+
+
+def _location_row(box: CompiledBox) -> Dict[str, Any]:
+    """Entry of the floorplan box list; labels aren't used anymore but stay in the API"""
+    return {
+        "model": box.model,
+        "dimensions": box.config["dimensions"],
+        "type": box.type,
+        "coords": box.coords,
+        "label": ""
+    }
+
+
+def encode_json(payload: Any) -> JsonBody:
+    """Encode a payload the way JSONResponse does and tag it with a hash of the bytes"""
+    body = json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+    return JsonBody(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def _floats(value: Any) -> Any:
+    """Copy of value with ints as floats, so 5 and 5.0 (as the writer saves it) hash the same"""
+    if isinstance(value, dict):
+        return {k: _floats(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_floats(v) for v in value]
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def catalog_version(config: Dict[str, Any]) -> str:
+    """
+    Version of a store's data, used for optimistic concurrency on edits
+
+    A hash of the parsed content rather than a counter, so it survives restarts and
+    is the same in every worker process. Formatting-only edits don't change it.
+    """
+    canonical = json.dumps(_floats(config), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def compile_store(data: Any) -> StoreCatalog:
+    """
+    Validate a parsed store file and build its catalog snapshot
+
+    Args:
+        data: Parsed store YAML; it is not modified
+
+    Returns:
+        The compiled StoreCatalog
+
+    Raises:
+        CatalogError: If the file or one of its boxes is invalid
+    """
+    if not data or "boxes" not in data or not isinstance(data["boxes"], list):
+        raise CatalogError("Invalid YAML structure: must contain a 'boxes' list")
+
+    config = copy.deepcopy(data)
+    pricing_mode = config.get("pricing-mode", "standard")
+
+    boxes = []
+    for i, box in enumerate(config["boxes"]):
+        if not isinstance(box, dict):
+            raise CatalogError(f"Box at index {i} must be a mapping")
+        validate_box(i, box, pricing_mode)
+        # An empty location is the same as none at all
+        if "location" in box and box["location"] is None:
+            box["location"] = {}
+        boxes.append(_compile_box(i, box, pricing_mode))
+
+    # Sort by section and then by model
+    boxes_with_sections = sorted((_section_row(box, pricing_mode) for box in boxes),
+                                 key=lambda row: (row["section"], row["model"]))
+
+    all_boxes = {"pricing_mode": pricing_mode,
+                 "boxes": [dict(box.config, model=box.model) for box in boxes]}
+    box_locations = [_location_row(box) for box in boxes]
+
+    # Models aren't guaranteed to be unique, so each maps to every box that uses it
+    model_index: Dict[str, List[int]] = {}
+    for box in boxes:
+        model_index.setdefault(box.model, []).append(box.index)
+
+    return StoreCatalog(
+        version=catalog_version(config),
+        pricing_mode=pricing_mode,
+        boxes=tuple(boxes),
+        model_index={model: tuple(positions) for model, positions in model_index.items()},
+        config=config,
+        all_boxes=all_boxes,
+        boxes_with_sections=boxes_with_sections,
+        box_locations=box_locations,
+        box_catalog=BoxCatalog([box.config for box in boxes]),
+        responses={
+            "boxes": encode_json(config),
+            "all_boxes": encode_json(all_boxes),
+            "boxes_with_sections": encode_json(boxes_with_sections),
+            "box-locations": encode_json(box_locations)
+        }
+    )
@@ -0,0 +1,72 @@
+"""
+LRU cache of packing results
+
+Counter staff price the same handful of common sizes over and over, so the
+results of the server-side packing engine are memoized. Entries are keyed by
+store, catalog version, item dimensions rounded to the 1/8" input precision
+and the full filter set, so a repeat query is a dictionary lookup.
+
+The catalog version is the store file's stamp, so hand edits to the YAML
+never serve stale results; save_store_yaml additionally drops every entry of
+the store it writes. The cache holds at most PACK_CACHE_SIZE entries
+(environment variable, default 4096) and evicts the least recently used.
+
+Cached result lists are shared between requests and must not be mutated.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, List, Optional, Tuple
+
+# Item dimensions are entered to the nearest 1/8"
+INPUT_PRECISION = 8
+
+MAX_ENTRIES = int(os.environ.get('PACK_CACHE_SIZE', '4096'))
+
+_cache: "OrderedDict[Tuple, Any]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def quantize(dims: Iterable[float]) -> Tuple[float, ...]:
+    """
+    Round item dimensions to the input precision
+
+    The engine sorts item dimensions before evaluating them, so they're sorted
+    here too and 12x10x8 shares an entry with 8x10x12.
+    """
+    return tuple(sorted((round(d * INPUT_PRECISION) / INPUT_PRECISION for d in dims), reverse=True))
+
+
+def make_key(store_id: str, version: Hashable, dims: Tuple[float, ...], filters: Hashable) -> Tuple:
+    """Build the cache key for one item; dims should already be quantized"""
+    return (store_id, version, dims, filters)
+
+
+def get(key: Tuple) -> Optional[Any]:
+    """Return the cached results for a key, or None on a miss"""
+    with _lock:
+        value = _cache.get(key)
+        if value is not None:
+            _cache.move_to_end(key)
+        return value
+
+
+def put(key: Tuple, value: Any):
+    """Store results, evicting the least recently used entries past MAX_ENTRIES"""
+    with _lock:
+        _cache[key] = value
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def invalidate(store_id: Optional[str] = None):
+    """Drop every entry of one store, or the whole cache when no store is given"""
+    with _lock:
+        if store_id is None:
+            _cache.clear()
+            return
+        stale: List[Tuple] = [key for key in _cache if key[0] == store_id]
+        for key in stale:
+            del _cache[key]
@@ -325,7 +325,8 @@ async function loadBoxes(storeId = '1') {
                 if (boxData.type === 'NormalBox') {
                     box = Box.NormalBox(boxData.dimensions, pricingData);
                 } else if (boxData.type === 'CustomBox') {
-                    box = new Box(boxData.dimensions, boxData.open_dim || 2, pricingData);
+                    // open_dim 0 is a real index, so only a missing open_dim falls back to 2
+                    box = new Box(boxData.dimensions, boxData.open_dim ?? 2, pricingData);
                 } else {
                     // Skip unknown box types
                     return;
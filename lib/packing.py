@@ -0,0 +1,485 @@
+"""
+Server-side packing engine
+
+Python port of the packing math in lib/packing.js (Box.gen_boxResults) so the
+backend can answer "which boxes fit this item" without shipping the whole box
+inventory to every terminal. Field names of the results match the JavaScript
+BoxResult class so the frontend can render them unchanged.
+
+A store's boxes are held as a struct-of-arrays (BoxCatalog) and every strategy
+is evaluated with NumPy array operations over all boxes and packing levels at
+once, instead of looping box by box. Unless impossible results were asked for,
+sorted dimension indexes first narrow each strategy down to the boxes that
+could possibly fit the item, so the work scales with the feasible boxes rather
+than with the size of the catalog.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+PACKING_LEVEL_NAMES = ["No Pack", "Standard Pack", "Fragile Pack", "Custom Pack"]
+PACKING_STRATEGIES = ["Normal", "Cut Down", "Telescoping", "Cheating", "Flattened"]
+RECOMENDATION_LEVELS = ["fits", "possible", "no space", "impossible"]
+PACKING_OFFSETS = {
+    "No Pack": 0,
+    "Standard Pack": 2,
+    "Fragile Pack": 4,
+    "Custom Pack": 6
+}
+
+# Array versions of the tables above, indexed by packing level / recomendation code
+LEVEL_OFFSETS = np.array([PACKING_OFFSETS[level] for level in PACKING_LEVEL_NAMES], dtype=float)
+NEXT_LEVEL = np.array([1, 2, 3, 3])
+FITS, POSSIBLE, NO_SPACE, IMPOSSIBLE = range(4)
+
+# Cut Down and Cheating keep the best orientation only if it scores below this (as in packing.js)
+SCORE_CUTOFF = 1000000
+
+# A Cheating rotation never shrinks an item dim below 1/sqrt(2) of its size (the
+# rotation angle is at most 45 degrees). Slightly under, to absorb rounding.
+CHEATING_SHRINK = np.sqrt(0.5) - 1e-9
+
+# Which BoxCatalog method evaluates each strategy
+STRATEGY_METHODS = {
+    "Normal": "normal",
+    "Cut Down": "cut_down",
+    "Telescoping": "telescoping",
+    "Cheating": "cheating",
+    "Flattened": "flattened"
+}
+
+
+def itemized_to_standard(itemized_prices: Dict[str, float]) -> List[float]:
+    """Convert an itemized-prices dict to the [no pack, standard, fragile, custom] array"""
+    box_price = itemized_prices.get("box-price", 0) or 0
+    return [
+        box_price,
+        box_price + (itemized_prices.get("standard-materials", 0) or 0) + (itemized_prices.get("standard-services", 0) or 0),
+        box_price + (itemized_prices.get("fragile-materials", 0) or 0) + (itemized_prices.get("fragile-services", 0) or 0),
+        box_price + (itemized_prices.get("custom-materials", 0) or 0) + (itemized_prices.get("custom-services", 0) or 0)
+    ]
+
+
+def js_number(value: float) -> str:
+    """Format a number the way a JavaScript template literal would (12.0 -> "12")"""
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def js_fixed(value: float, digits: int = 1) -> str:
+    """
+    Format a number like JavaScript's toFixed (11.25 -> "11.3")
+
+    toFixed rounds the exact binary value of the number and breaks ties away
+    from zero; Python's format rounds ties to even instead (11.25 -> "11.2").
+    """
+    return str(Decimal(float(value)).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP))
+
+
+def calc_recomendation(lowest: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """
+    Vectorized calcRecomendation
+
+    Args:
+        lowest: (levels, boxes) smallest offset of each result
+        levels: Packing level index of each row
+
+    Returns:
+        (levels, boxes) array of recomendation codes (FITS, POSSIBLE, NO_SPACE, IMPOSSIBLE)
+    """
+    offsets = LEVEL_OFFSETS[levels][:, None]
+    rec = np.full(lowest.shape, FITS, dtype=np.int8)
+    rec[(lowest > 0) & (lowest < offsets)] = POSSIBLE
+    rec[(lowest == 0) & (levels[:, None] != 0)] = NO_SPACE
+    rec[lowest < 0] = IMPOSSIBLE
+    return rec
+
+
+class StrategyResult:
+    """Results of one strategy for every (packing level, box) pair"""
+
+    def __init__(self, price, score, rec, comment_args=None, valid=None):
+        self.price = price                  # (levels, boxes)
+        self.score = score                  # (levels, boxes)
+        self.rec = rec                      # (levels, boxes) recomendation codes
+        self.comment_args = comment_args    # (levels, boxes, n) numbers used by the comment
+        self.valid = valid                  # (levels, boxes) False where the strategy gave no result
+
+
+class BoxCatalog:
+    """Struct-of-arrays view of a store's boxes"""
+
+    def __init__(self, box_configs: List[Dict[str, Any]]):
+        dims, open_dims, prices = [], [], []
+        for box in box_configs:
+            # Unknown box types are skipped like the frontend does
+            if box.get("type") == "NormalBox":
+                # Assumes the last dimension is the open dimension
+                open_dim = 2
+            elif box.get("type") == "CustomBox":
+                open_dim = box.get("open_dim", 2)
+            else:
+                continue
+
+            if "prices" in box and isinstance(box["prices"], list):
+                box_prices = box["prices"]
+            elif isinstance(box.get("itemized-prices"), dict):
+                box_prices = itemized_to_standard(box["itemized-prices"])
+            else:
+                box_prices = [0, 0, 0, 0]
+
+            dims.append(box["dimensions"])
+            open_dims.append(open_dim)
+            prices.append(box_prices)
+
+        raw_dims = np.array(dims, dtype=float).reshape(-1, 3)
+        # Presort by size; a stable sort of the indices tells us where the open
+        # dimension ended up, even for boxes with repeated dimensions
+        order = np.argsort(-raw_dims, axis=1, kind="stable")
+        self.dimensions = np.take_along_axis(raw_dims, order, axis=1)
+        # The sorted dimensions as given in the YAML, for the response
+        self.dimension_lists = [[box_dims[i] for i in box_order] for box_dims, box_order in zip(dims, order.tolist())]
+        self.open_dim = np.argmax(order == np.array(open_dims, dtype=int).reshape(-1, 1), axis=1)
+        self.prices = np.array(prices, dtype=float).reshape(-1, 4)
+
+        rows = np.arange(len(self.dimensions))
+        self.open_length = self.dimensions[rows, self.open_dim]
+        # Larger/smaller constraint are the two dims that aren't the open one, in sorted order
+        self.larger_constraint = np.where(self.open_dim == 0, self.dimensions[:, 1], self.dimensions[:, 0])
+        self.smaller_constraint = np.where(self.open_dim == 2, self.dimensions[:, 1], self.dimensions[:, 2])
+        self.flap_length = self.smaller_constraint / 2
+        self.flat_length = np.maximum(self.open_length + self.flap_length * 2, self.smaller_constraint + self.larger_constraint)
+        self.flat_width = np.minimum(self.open_length + self.flap_length * 2, self.smaller_constraint + self.larger_constraint)
+
+        # Dimension indexes: box order sorted by a key, and the sorted keys for searchsorted
+        self.indexes = {}
+        for name, key in (("largest", self.dimensions[:, 0]),
+                          ("larger_constraint", self.larger_constraint),
+                          ("flat_length", self.flat_length)):
+            order = np.argsort(key, kind="stable")
+            self.indexes[name] = (order, key[order])
+
+    @classmethod
+    def from_config(cls, data: Dict[str, Any]) -> "BoxCatalog":
+        """Build the catalog from parsed store YAML"""
+        return cls(data["boxes"])
+
+    def __len__(self):
+        return len(self.dimensions)
+
+    def take(self, boxes: np.ndarray) -> "BoxCatalog":
+        """A catalog holding only the given boxes (without indexes), for evaluating candidates"""
+        subset = object.__new__(BoxCatalog)
+        for name in ("dimensions", "open_dim", "prices", "open_length", "larger_constraint",
+                     "smaller_constraint", "flap_length", "flat_length", "flat_width"):
+            setattr(subset, name, getattr(self, name)[boxes])
+        return subset
+
+    def _at_least(self, index: str, minimum: float) -> np.ndarray:
+        """Boxes whose index key is >= minimum, found by binary search on the sorted index"""
+        order, keys = self.indexes[index]
+        return order[np.searchsorted(keys, minimum, side="left"):]
+
+    def candidates(self, strategy: str, items: np.ndarray, levels: np.ndarray,
+                   allowed: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Boxes that could give a result passing the recomendation filter
+
+        The bounds are necessary conditions only - the evaluators still decide
+        the actual recomendation of every candidate.
+
+        Args:
+            strategy: Packing strategy name
+            items: (items, 3) sorted item dims; bounds use the smallest of each
+            levels: Packing level indexes
+            allowed: Whether each recomendation code passes the filter
+
+        Returns:
+            Indices of the candidate boxes, or None when every box is a candidate
+        """
+        if allowed[IMPOSSIBLE]:
+            return None
+        smallest_item = items.min(axis=0)
+        smallest_offset = LEVEL_OFFSETS[levels].min()
+
+        if strategy == "Flattened":
+            # Flattened only ever fits or is impossible, whatever the filter
+            if not allowed[FITS] or smallest_item[2] > 1:
+                return np.array([], dtype=int)
+            boxes = self._at_least("flat_length", smallest_item[0] + smallest_offset)
+            return boxes[self.flat_width[boxes] >= smallest_item[1] + smallest_offset]
+
+        # Smallest offset every non-impossible result must leave in each dimension
+        margin = 0 if (allowed[POSSIBLE] or allowed[NO_SPACE]) else smallest_offset
+
+        if strategy == "Telescoping":
+            # Length is made up with more boxes, so only the cross-section matters
+            boxes = self._at_least("larger_constraint", smallest_item[1] + margin)
+            return boxes[self.smaller_constraint[boxes] >= smallest_item[2] + margin]
+
+        # Normal and Cut Down need the sorted box dims to cover the sorted item dims;
+        # Cheating can rotate each item dim down to at most 1/sqrt(2) of its size
+        minimum = smallest_item * CHEATING_SHRINK + margin if strategy == "Cheating" else smallest_item + margin
+        boxes = self._at_least("largest", minimum[0])
+        dims = self.dimensions[boxes]
+        return boxes[(dims[:, 1] >= minimum[1]) & (dims[:, 2] >= minimum[2])]
+
+    # Every evaluator takes items as an (items, 3) array of sorted dims and
+    # returns (items, levels, boxes) arrays, so a whole order is one computation
+
+    def normal(self, items: np.ndarray, levels: np.ndarray) -> StrategyResult:
+        offsets = self.dimensions - items[:, None, :]
+        shape = (len(items), len(levels), len(self))
+        lowest = np.broadcast_to(offsets.min(axis=2)[:, None, :], shape)
+        score = np.broadcast_to((offsets ** 2).sum(axis=2)[:, None, :], shape)
+        return StrategyResult(np.broadcast_to(self.prices[:, levels].T, shape), score, calc_recomendation(lowest, levels))
+
+    def cut_down(self, items: np.ndarray, levels: np.ndarray) -> StrategyResult:
+        # Orientation k puts item dim k along the open dimension; the items are sorted
+        # so the larger/smaller of the other two dims are known up front
+        shape = (len(items), len(levels), len(self), 3)
+        larger_input = items[:, None, None, [1, 0, 0]]
+        smaller_input = items[:, None, None, [2, 2, 1]]
+        open_input = items[:, None, None, :]
+        level_offsets = LEVEL_OFFSETS[levels][:, None, None]
+
+        larger_offset = np.broadcast_to(self.larger_constraint[:, None] - larger_input, shape)
+        smaller_offset = np.broadcast_to(self.smaller_constraint[:, None] - smaller_input, shape)
+        open_offset = np.minimum(level_offsets, self.open_length[:, None] - open_input)
+        scores = larger_offset ** 2 + smaller_offset ** 2 + open_offset ** 2
+
+        best, score, valid = _best_orientation(scores)
+        lowest = np.minimum(np.minimum(_pick(larger_offset, best), _pick(smaller_offset, best)), _pick(open_offset, best))
+        cut_length = np.minimum(self.open_length, _pick(np.broadcast_to(open_input, shape), best) + level_offsets[..., 0])
+        comment_args = np.stack([np.broadcast_to(self.larger_constraint, cut_length.shape),
+                                 np.broadcast_to(self.smaller_constraint, cut_length.shape),
+                                 cut_length], axis=-1)
+        return StrategyResult(np.broadcast_to(self.prices[:, levels].T, score.shape), score,
+                              calc_recomendation(lowest, levels), comment_args, valid)
+
+    def telescoping(self, items: np.ndarray, levels: np.ndarray) -> StrategyResult:
+        shape = (len(items), len(levels), len(self))
+        level_offsets = LEVEL_OFFSETS[levels][:, None]
+        min_length = items[:, 0, None, None] + level_offsets
+        larger_offset = self.larger_constraint - items[:, 1, None, None]
+        smaller_offset = self.smaller_constraint - items[:, 2, None, None]
+        score = np.broadcast_to(larger_offset ** 2 + smaller_offset ** 2, shape)
+        end_box_length = self.open_length + self.flap_length
+        center_box_length = end_box_length + self.flap_length
+        center_remaining = min_length - 2 * end_box_length
+        with np.errstate(divide="ignore", invalid="ignore"):
+            center_boxes = np.where(center_remaining > 0, np.ceil(center_remaining / center_box_length), 0)
+        total_boxes = 2 + center_boxes
+        # One of the boxes is charged at the next packing level
+        total_cost = self.prices[:, levels].T * (total_boxes - 1) + self.prices[:, NEXT_LEVEL[levels]].T
+        lowest = np.minimum(np.minimum(larger_offset, smaller_offset), level_offsets)
+        comment_args = np.stack([np.broadcast_to(min_length, shape),
+                                 np.broadcast_to(self.larger_constraint, shape),
+                                 np.broadcast_to(self.smaller_constraint, shape),
+                                 total_boxes], axis=-1)
+        return StrategyResult(total_cost, score, calc_recomendation(lowest, levels), comment_args)
+
+    def cheating(self, items: np.ndarray, levels: np.ndarray) -> StrategyResult:
+        # Orientation k keeps item dim k along box dim k and rotates the item in the
+        # plane of the other two. Everything is sorted, so the larger of the other
+        # two is always the one with the lower index.
+        new_dims = np.empty((len(items), len(self), 3, 3))
+        for k in range(3):
+            j1, j2 = (k + 1) % 3, (k + 2) % 3
+            larger_dim = self.dimensions[:, min(j1, j2)]
+            smaller_dim = self.dimensions[:, max(j1, j2)]
+            larger_input = items[:, min(j1, j2), None]
+            smaller_input = items[:, max(j1, j2), None]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                angle = np.arctan(smaller_dim / larger_dim)
+            new_dims[:, :, k, k] = items[:, k, None]
+            new_dims[:, :, k, j1] = np.sin(angle) * smaller_input + np.cos(angle) * larger_input
+            new_dims[:, :, k, j2] = np.cos(angle) * smaller_input + np.sin(angle) * larger_input
+
+        offsets = self.dimensions[:, None, :] - new_dims
+        best, score, valid = _best_orientation((offsets ** 2).sum(axis=3))
+        best_dims = np.take_along_axis(new_dims, best[:, :, None, None], axis=2)[:, :, 0]
+        best_offsets = np.take_along_axis(offsets, best[:, :, None, None], axis=2)[:, :, 0]
+        shape = (len(items), len(levels), len(self))
+        lowest = np.broadcast_to(best_offsets.min(axis=2)[:, None, :], shape)
+        return StrategyResult(np.broadcast_to(self.prices[:, levels].T, shape),
+                              np.broadcast_to(score[:, None, :], shape),
+                              calc_recomendation(lowest, levels),
+                              np.broadcast_to(best_dims[:, None], shape + (3,)),
+                              np.broadcast_to(valid[:, None, :], shape))
+
+    def flattened(self, items: np.ndarray, levels: np.ndarray) -> StrategyResult:
+        shape = (len(items), len(levels), len(self))
+        level_offsets = LEVEL_OFFSETS[levels][:, None]
+        flat_box_length = self.open_length + self.flap_length * 2
+        flat_box_width = self.smaller_constraint + self.larger_constraint
+        larger_offset = self.flat_length - items[:, 0, None, None] - level_offsets
+        smaller_offset = self.flat_width - items[:, 1, None, None] - level_offsets
+        height_offset = 1 - items[:, 2, None, None]
+        score = larger_offset ** 2 + smaller_offset ** 2 + height_offset ** 2
+        lowest = np.minimum(np.minimum(larger_offset, smaller_offset), height_offset)
+        # Flat packing is either impossible or it fits
+        rec = np.where(lowest < 0, IMPOSSIBLE, FITS).astype(np.int8)
+        comment_args = np.stack([np.broadcast_to(flat_box_length, shape),
+                                 np.broadcast_to(flat_box_width, shape)], axis=-1)
+        return StrategyResult(np.broadcast_to(self.prices[:, levels].T, shape), score, rec, comment_args)
+
+
+def _best_orientation(scores: np.ndarray):
+    """
+    Pick the first orientation with the lowest score along the last axis
+
+    Matches the `score < bestScore` loop in packing.js: NaN scores never win and
+    nothing is picked when every score is at or above SCORE_CUTOFF.
+
+    Returns:
+        (best orientation index, its score, whether a result exists)
+    """
+    scores = np.where(np.isnan(scores), np.inf, scores)
+    best = np.argmin(scores, axis=-1)
+    score = np.take_along_axis(scores, best[..., None], axis=-1)[..., 0]
+    return best, score, score < SCORE_CUTOFF
+
+
+def _pick(values: np.ndarray, index: np.ndarray) -> np.ndarray:
+    """Select values[..., index] element-wise along the last axis"""
+    return np.take_along_axis(values, index[..., None], axis=-1)[..., 0]
+
+
+def _comment(strategy: str, args: List[float]) -> str:
+    if strategy == "Cut Down":
+        return f"Expected dims: [{js_number(args[0])}, {js_number(args[1])}, {js_number(args[2])}]"
+    if strategy == "Telescoping":
+        return f"Expected dims: [{js_number(args[0])}, {js_number(args[1])}, {js_number(args[2])}] with {int(args[3])} boxes"
+    if strategy == "Cheating":
+        return f"Internal dims: [{js_fixed(args[0])}, {js_fixed(args[1])}, {js_fixed(args[2])}]"
+    if strategy == "Flattened":
+        return f"Expected dims: [{js_number(args[0])}, {js_number(args[1])}, 1]"
+    return ""
+
+
+def pack_batch(catalog: BoxCatalog, items: List[List[float]], packing_levels: Iterable[str], strategies: Iterable[str],
+               recomendations: Iterable[str], score_priority: bool = False,
+               limit: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Evaluate every box for a list of items and return the filtered, sorted results per item
+
+    Mirrors gen_chart in index.js, including its sort order. All items are
+    evaluated together as one (items x boxes) computation.
+
+    Args:
+        catalog: The store's boxes
+        items: Item dimensions, each in any order
+        packing_levels: Packing levels to include (see PACKING_LEVEL_NAMES)
+        strategies: Packing strategies to include (see PACKING_STRATEGIES)
+        recomendations: Recomendation levels to include (see RECOMENDATION_LEVELS)
+        score_priority: Sort by score with price as the tie breaker instead of the reverse
+        limit: Only return the best `limit` results per item (top-K selection
+               instead of sorting every result)
+
+    Returns:
+        One list of BoxResult dicts per item, best first
+    """
+    items = -np.sort(-np.asarray(items, dtype=float).reshape(-1, 3), axis=1)
+    levels = np.array([i for i, level in enumerate(PACKING_LEVEL_NAMES) if level in packing_levels], dtype=int)
+    strategies = [strategy for strategy in PACKING_STRATEGIES if strategy in strategies]
+    allowed = np.array([level in recomendations for level in RECOMENDATION_LEVELS])
+    if len(catalog) == 0 or len(levels) == 0 or not strategies:
+        return [[] for _ in range(len(items))]
+
+    selections = []
+    for strategy in strategies:
+        # Only evaluate the boxes the dimension index says could pass the filter
+        candidates = catalog.candidates(strategy, items, levels, allowed)
+        boxes = catalog if candidates is None else catalog.take(candidates)
+        result = getattr(boxes, STRATEGY_METHODS[strategy])(items, levels)
+        keep = allowed[result.rec]
+        if result.valid is not None:
+            keep &= result.valid
+        item_pos, level_pos, local_box = np.nonzero(keep)
+        box = local_box if candidates is None else candidates[local_box]
+        selections.append((result, item_pos, level_pos, local_box, box))
+
+    # One row per kept result, concatenated across strategies
+    strategy_pos = np.concatenate([np.full(len(box), s) for s, (_, _, _, _, box) in enumerate(selections)])
+    local_index = np.concatenate([np.arange(len(box)) for _, _, _, _, box in selections])
+    item_pos = np.concatenate([i for _, i, _, _, _ in selections])
+    level_pos = np.concatenate([lp for _, _, lp, _, _ in selections])
+    box = np.concatenate([b for _, _, _, _, b in selections])
+    price = np.concatenate([r.price[i, lp, b] for r, i, lp, b, _ in selections])
+    score = np.concatenate([r.score[i, lp, b] for r, i, lp, b, _ in selections])
+    rec = np.concatenate([r.rec[i, lp, b] for r, i, lp, b, _ in selections])
+
+    # Insertion order of gen_chart (box, then level, then strategy) breaks ties like its stable sort
+    insertion = (box * len(levels) + level_pos) * len(strategies) + strategy_pos
+    sort_key = score * 1000 + price if score_priority else price * 1000 + score
+
+    # Select the best rows of each item; only the selected rows get fully sorted
+    if len(items) == 1:
+        groups = [np.arange(len(item_pos))]
+    else:
+        by_item = np.argsort(item_pos, kind="stable")
+        groups = np.split(by_item, np.cumsum(np.bincount(item_pos, minlength=len(items)))[:-1])
+    chosen = [_top_k(sort_key, insertion, rows, limit) for rows in groups]
+
+    # Comments are only formatted for the rows that are returned
+    selected = np.concatenate(chosen)
+    comments = {}
+    for s, (result, i, lp, b, _) in enumerate(selections):
+        if result.comment_args is None:
+            continue
+        rows = selected[strategy_pos[selected] == s]
+        j = local_index[rows]
+        for row, args in zip(rows.tolist(), result.comment_args[i[j], lp[j], b[j]].tolist()):
+            comments[row] = _comment(strategies[s], args)
+
+    results = []
+    for rows in chosen:
+        item_results = []
+        for row, s, level, b, p, sc, rc in zip(rows.tolist(), strategy_pos[rows].tolist(),
+                                               levels[level_pos[rows]].tolist(), box[rows].tolist(),
+                                               price[rows].tolist(), score[rows].tolist(), rec[rows].tolist()):
+            item_results.append({
+                "dimensions": catalog.dimension_lists[b],
+                "packLevel": PACKING_LEVEL_NAMES[level],
+                "price": p,
+                "recomendationLevel": RECOMENDATION_LEVELS[rc],
+                "comment": comments.get(row, ""),
+                "score": sc,
+                "strategy": strategies[s]
+            })
+        results.append(item_results)
+    return results
+
+
+def _top_k(sort_key: np.ndarray, insertion: np.ndarray, rows: np.ndarray, limit: Optional[int]) -> np.ndarray:
+    """
+    The best `limit` of the given rows, best first
+
+    Partitions on the sort key to find the cutoff value, so only the rows at or
+    below it get sorted. Rows tied on the key are ordered by insertion, which
+    keeps the result identical to a full stable sort.
+    """
+    if limit is not None and len(rows) > limit:
+        keys = sort_key[rows]
+        cutoff = np.partition(keys, limit - 1)[limit - 1]
+        if not np.isnan(cutoff):
+            rows = rows[keys <= cutoff]
+    return rows[np.lexsort((insertion[rows], sort_key[rows]))][:limit]
+
+
+def pack(catalog: BoxCatalog, item_dims: List[float], packing_levels: Iterable[str], strategies: Iterable[str],
+         recomendations: Iterable[str], score_priority: bool = False,
+         limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Evaluate every box for one item and return the filtered, sorted results
+
+    See pack_batch for the arguments.
+
+    Returns:
+        List of BoxResult dicts, best first
+    """
+    return pack_batch(catalog, [item_dims], packing_levels, strategies, recomendations, score_priority, limit)[0]
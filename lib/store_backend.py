@@ -0,0 +1,603 @@
+"""
+Storage backends for store catalogs
+
+A store's catalog - its pricing mode and boxes with their prices, locations and
+alternate depths - lives in one of two places, picked with STORE_BACKEND:
+
+    yaml    stores/store{id}.yml, plus its change journal (the default)
+    sqlite  indexed tables in the application's SQLite database
+
+Both backends hand out the same YAML-shaped dict, so the rest of the app
+doesn't care where a store came from. Each one also reports a cheap stamp that
+changes whenever the store does, which the store cache checks on every request
+before deciding to reload: the file's (mtime, size) for YAML and a revision
+counter bumped by every write for SQLite.
+
+Reading a SQLite store is a handful of primary-key range queries, and price
+and location edits update just the rows of the boxes they touched inside one
+transaction instead of rewriting the whole catalog.
+
+Stores move between the two formats with tools/manage_stores.py.
+"""
+
+import io
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from lib import store_journal
+from lib.atomic_file import atomic_write
+from lib.auth_manager import get_db, prepare_db_dir
+
+BACKEND = os.environ.get('STORE_BACKEND', 'yaml')
+
+# Box fields that have their own columns or tables; anything else is kept as JSON
+BOX_ORDER = ["type", "supplier", "model", "dimensions", "open_dim",
+             "alternate_depths", "prices", "itemized-prices", "location"]
+
+
+def render_store_yaml(store_id: str, data: dict) -> str:
+    """Render store data in the hand-maintained YAML format of the store files"""
+    # Custom YAML writing to maintain the desired format
+    with io.StringIO() as f:
+        # Write pricing mode if present
+        if "pricing-mode" in data:
+            f.write(f"pricing-mode: {data['pricing-mode']}\n")
+        
+        f.write("boxes:\n")
+
+        # Determine pricing mode
+        pricing_mode = data.get("pricing-mode", "standard")
+
+        # Write each box in a nice format
+        for box in data["boxes"]:
+            # Always write the type
+            f.write(f"  - type: {box['type']}\n")
+
+            # Handle supplier field
+            if store_id == "1" and "supplier" not in box:
+                # Skip supplier field for store1 if not present to maintain legacy format
+                pass
+            else:
+                supplier = box.get('supplier', 'Unknown')
+                f.write(f"    supplier: {supplier}\n")
+
+            # Handle model field
+            if store_id == "1" and "model" not in box:
+                # Skip model field for store1 if not present to maintain legacy format
+                pass
+            else:
+                model = box.get('model', f"Unknown-{box['dimensions'][0]}-{box['dimensions'][1]}-{box['dimensions'][2]}")
+                f.write(f"    model: \"{model}\"\n")
+
+            # Safely format dimensions with square brackets and commas, no spaces
+            # Use a safer approach to prevent YAML injection
+            if isinstance(box['dimensions'], list) and len(box['dimensions']) == 3:
+                dimensions = [float(d) if isinstance(d, (int, float)) else 0 for d in box['dimensions']]
+                dimensions_str = str(dimensions).replace(" ", "")
+                f.write(f"    dimensions: {dimensions_str}\n")
+            else:
+                f.write(f"    dimensions: [0,0,0]\n")
+
+            # CustomBox needs its open dimension, which is an index into dimensions.
+            # compile_store rejects a CustomBox without one, so dropping it here
+            # would break every later read of the store.
+            if box.get("open_dim") in (0, 1, 2) and not isinstance(box["open_dim"], bool):
+                f.write(f"    open_dim: {int(box['open_dim'])}\n")
+
+            # Add alternate_depths if present
+            if "alternate_depths" in box and isinstance(box['alternate_depths'], list):
+                # Validate depths are numeric and reasonable
+                alt_depths = [float(d) if isinstance(d, (int, float)) and 0 <= d <= 100 else 0 for d in box['alternate_depths']]
+                alt_depths_str = str(alt_depths).replace(" ", "")
+                f.write(f"    alternate_depths: {alt_depths_str}\n")
+
+            # Write prices or itemized-prices based on pricing mode
+            if pricing_mode == "standard" and "prices" in box:
+                # Safely format prices with square brackets and commas, no spaces
+                if isinstance(box['prices'], list) and len(box['prices']) == 4:
+                    # Validate prices are numeric and in reasonable range
+                    prices = [float(p) if isinstance(p, (int, float)) and 0 <= p <= 10000 else 0 for p in box['prices']]
+                    prices_str = str(prices).replace(" ", "")
+                    f.write(f"    prices: {prices_str}\n")
+                else:
+                    f.write(f"    prices: [0.0,0.0,0.0,0.0]\n")
+            elif pricing_mode == "itemized" and "itemized-prices" in box:
+                # Write itemized prices
+                ip = box["itemized-prices"]
+                f.write(f"    itemized-prices:\n")
+                f.write(f"      box-price: {ip.get('box-price', 0)}\n")
+                f.write(f"      standard-materials: {ip.get('standard-materials', 0)}\n")
+                f.write(f"      standard-services: {ip.get('standard-services', 0)}\n")
+                f.write(f"      fragile-materials: {ip.get('fragile-materials', 0)}\n")
+                f.write(f"      fragile-services: {ip.get('fragile-services', 0)}\n")
+                f.write(f"      custom-materials: {ip.get('custom-materials', 0)}\n")
+                f.write(f"      custom-services: {ip.get('custom-services', 0)}\n")
+
+            # Add location if present
+            if store_id == "1" and "location" not in box:
+                # Skip location field for store1 if not present to maintain legacy format
+                pass
+            else:
+                location = box.get('location', {})
+                
+                # Handle empty or None locations - skip entirely
+                if location is None or (isinstance(location, dict) and not location):
+                    # Skip empty locations completely
+                    pass
+                # Handle dictionary with coords
+                elif isinstance(location, dict) and 'coords' in location and location['coords']:
+                    # Start location section
+                    f.write(f"    location:\n")
+                    
+                    coords = location['coords']
+                    # Ensure coords are floats and valid
+                    if isinstance(coords, list) and len(coords) == 2:
+                        x = float(coords[0]) if isinstance(coords[0], (int, float)) else 0
+                        y = float(coords[1]) if isinstance(coords[1], (int, float)) else 0
+                        f.write(f"      coords: [{x}, {y}]\n")
+                # Handle legacy string locations (skip completely)
+                elif isinstance(location, str) and location.strip():
+                    # Skip legacy string locations
+                    pass
+
+            f.write("\n")
+
+        return f.getvalue()
+
+
+def normalize_box(store_id: str, box: Dict[str, Any], pricing_mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Return a box as it reads back after render_store_yaml has written it
+
+    Prices and coordinates come back as sanitized floats, and fields the writer
+    drops (legacy string locations, for instance) are gone.
+    """
+    data = {"boxes": [box]}
+    if pricing_mode is not None:
+        data["pricing-mode"] = pricing_mode
+    return yaml.safe_load(render_store_yaml(store_id, data))["boxes"][0]
+
+
+def file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """Return the (st_mtime_ns, st_size) stamp of a file, or None if it's missing"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class YamlBackend:
+    """Stores kept in stores/store{id}.yml, with their change journals applied"""
+
+    name = "yaml"
+
+    def __init__(self, stores_dir: str = "stores"):
+        self.stores_dir = stores_dir
+
+    def init(self):
+        """Nothing to set up; the store files are created by hand"""
+
+    def path(self, store_id: str) -> str:
+        """Path of a store's YAML file"""
+        return os.path.join(self.stores_dir, f"store{store_id}.yml")
+
+    def describe(self, store_id: str) -> str:
+        """Where a store lives, for error messages"""
+        return self.path(store_id)
+
+    def exists(self, store_id: str) -> bool:
+        return os.path.exists(self.path(store_id))
+
+    def store_ids(self) -> List[str]:
+        """IDs of every store file, in numeric order"""
+        ids = []
+        for name in os.listdir(self.stores_dir):
+            match = re.fullmatch(r"store(\d+)\.yml", name)
+            if match:
+                ids.append(match.group(1))
+        return sorted(ids, key=int)
+
+    def stamp(self, store_id: str) -> Optional[Any]:
+        """
+        Return the (file stamp, journal stamp or None) of a store
+
+        Returns:
+            The stamp, or None if the store file does not exist
+        """
+        path = self.path(store_id)
+        yaml_stamp = file_stamp(path)
+        if yaml_stamp is None:
+            return None
+        return (yaml_stamp, file_stamp(store_journal.journal_path(path)))
+
+    def read(self, store_id: str) -> Tuple[Any, Any]:
+        """
+        Parse a store file and apply its journal
+
+        Returns:
+            (stamp, data) - the stamp of what was actually read
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+            yaml.YAMLError: If the file cannot be parsed
+        """
+        path = self.path(store_id)
+        journal = store_journal.journal_path(path)
+
+        # Stamp what is actually read rather than an earlier stat() so a write landing in
+        # between is picked up on the next request. The journal is stamped before reading,
+        # so entries appended meanwhile force a re-read.
+        journal_stamp = file_stamp(journal)
+        with open(path, "r") as f:
+            st = os.fstat(f.fileno())
+            data = yaml.safe_load(f)
+        if journal_stamp is not None:
+            store_journal.apply(data, store_journal.read(journal))
+            # Serve the store as compaction will write it, which is also what a full save
+            # in the default mode would have left on disk
+            data = yaml.safe_load(render_store_yaml(store_id, data))
+        return ((st.st_mtime_ns, st.st_size), journal_stamp), data
+
+    def write(self, store_id: str, data: Dict[str, Any]):
+        """Replace a store file with the given data"""
+        self.write_text(store_id, render_store_yaml(store_id, data))
+
+    def write_text(self, store_id: str, text: str):
+        """Replace a store file with already rendered YAML"""
+        # Written to a temp file and renamed over the old one, so readers never see a partial catalog
+        with atomic_write(self.path(store_id)) as f:
+            f.write(text)
+
+
+def _is_scalar(value: Any) -> bool:
+    # Values SQLite stores as-is; booleans would come back as integers
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def _split_box(box: Dict[str, Any]):
+    """
+    Split a box into its table rows
+
+    Fields that don't have the usual shape (a legacy string location, a
+    prices list with a typo in it, ...) are kept verbatim as JSON, so a store
+    round-trips through the database unchanged.
+
+    Returns:
+        (box columns, [(field, price)], (x, y) or None, [depth], extra fields)
+    """
+    extra = dict(box)
+    columns: Dict[str, Any] = {}
+
+    for field in ("type", "supplier", "model", "open_dim"):
+        if _is_scalar(extra.get(field)):
+            columns[field] = extra.pop(field)
+
+    dimensions = extra.get("dimensions")
+    if isinstance(dimensions, list) and len(dimensions) == 3 and all(_is_scalar(d) for d in dimensions):
+        columns["dimensions"] = extra.pop("dimensions")
+
+    prices = []
+    if isinstance(extra.get("prices"), list) and extra["prices"] and all(_is_scalar(p) for p in extra["prices"]):
+        prices += [(f"prices.{i}", p) for i, p in enumerate(extra.pop("prices"))]
+    itemized = extra.get("itemized-prices")
+    if (isinstance(itemized, dict) and itemized
+            and all(isinstance(k, str) and _is_scalar(v) for k, v in itemized.items())):
+        prices += [(f"itemized-prices.{k}", v) for k, v in extra.pop("itemized-prices").items()]
+
+    location = None
+    loc = extra.get("location")
+    if (isinstance(loc, dict) and list(loc) == ["coords"] and isinstance(loc["coords"], list)
+            and len(loc["coords"]) == 2 and all(_is_scalar(c) for c in loc["coords"])):
+        location = tuple(extra.pop("location")["coords"])
+
+    depths = []
+    if (isinstance(extra.get("alternate_depths"), list) and extra["alternate_depths"]
+            and all(_is_scalar(d) for d in extra["alternate_depths"])):
+        depths = extra.pop("alternate_depths")
+
+    return columns, prices, location, depths, extra
+
+
+def _join_box(row: Any, prices: List[Tuple[str, Any]], location: Optional[Tuple[Any, Any]],
+              depths: List[Any]) -> Dict[str, Any]:
+    """Reassemble a box from its table rows, inverse of _split_box"""
+    fields: Dict[str, Any] = json.loads(row["extra"]) if row["extra"] else {}
+
+    for field in ("type", "supplier", "model", "open_dim"):
+        if row[field] is not None:
+            fields[field] = row[field]
+    if row["dim0"] is not None:
+        fields["dimensions"] = [row["dim0"], row["dim1"], row["dim2"]]
+    if depths:
+        fields["alternate_depths"] = depths
+    if location is not None:
+        fields["location"] = {"coords": list(location)}
+
+    for field, price in prices:
+        key, _, name = field.partition(".")
+        if key == "prices":
+            values = fields.setdefault("prices", [])
+            index = int(name)
+            values.extend([0] * (index + 1 - len(values)))
+            values[index] = price
+        else:
+            fields.setdefault("itemized-prices", {})[name] = price
+
+    # Same key order as the store files
+    box = {field: fields.pop(field) for field in BOX_ORDER if field in fields}
+    box.update(fields)
+    return box
+
+
+class SqliteBackend:
+    """Stores kept in the catalog tables of the application's SQLite database"""
+
+    name = "sqlite"
+
+    def init(self):
+        """Create the catalog tables if they don't exist"""
+        prepare_db_dir()
+
+        with get_db() as db:
+            # One row per store; revision is bumped by every write and serves as the cache stamp
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS catalog_stores (
+                    store_id TEXT PRIMARY KEY,
+                    pricing_mode TEXT,
+                    settings TEXT,
+                    revision INTEGER NOT NULL DEFAULT 1
+                )
+            ''')
+
+            # Dimensions, prices and depths are declared without a type so integers and
+            # floats come back exactly as they were stored
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS catalog_boxes (
+                    store_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    type TEXT,
+                    supplier TEXT,
+                    model TEXT,
+                    dim0, dim1, dim2,
+                    open_dim,
+                    extra TEXT,
+                    PRIMARY KEY (store_id, position)
+                )
+            ''')
+            db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_catalog_boxes_model
+                ON catalog_boxes (store_id, model)
+            ''')
+
+            # Fields are named like journal entries: prices.<level> or itemized-prices.<name>
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS catalog_prices (
+                    store_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    field TEXT NOT NULL,
+                    price,
+                    PRIMARY KEY (store_id, position, field)
+                )
+            ''')
+
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS catalog_locations (
+                    store_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    x, y,
+                    PRIMARY KEY (store_id, position)
+                )
+            ''')
+
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS catalog_alternate_depths (
+                    store_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    seq INTEGER NOT NULL,
+                    depth,
+                    PRIMARY KEY (store_id, position, seq)
+                )
+            ''')
+
+            db.commit()
+
+    def describe(self, store_id: str) -> str:
+        """Where a store lives, for error messages"""
+        return f"store {store_id} of the catalog database"
+
+    def exists(self, store_id: str) -> bool:
+        return self.stamp(store_id) is not None
+
+    def store_ids(self) -> List[str]:
+        """IDs of every store in the database, in numeric order"""
+        with get_db() as db:
+            rows = db.execute("SELECT store_id FROM catalog_stores").fetchall()
+        return sorted((row["store_id"] for row in rows), key=int)
+
+    def stamp(self, store_id: str) -> Optional[int]:
+        """
+        Return the revision of a store
+
+        Returns:
+            The revision, or None if the store does not exist
+        """
+        with get_db() as db:
+            row = db.execute(
+                "SELECT revision FROM catalog_stores WHERE store_id = ?", (store_id,)
+            ).fetchone()
+        return row["revision"] if row else None
+
+    def read(self, store_id: str) -> Tuple[int, Dict[str, Any]]:
+        """
+        Assemble a store's data from its rows
+
+        Returns:
+            (revision, data) - read in one transaction, so they always match
+
+        Raises:
+            FileNotFoundError: If the store does not exist
+        """
+        with get_db() as db:
+            db.execute("BEGIN")
+            try:
+                store = db.execute(
+                    "SELECT * FROM catalog_stores WHERE store_id = ?", (store_id,)
+                ).fetchone()
+                if store is None:
+                    raise FileNotFoundError(self.describe(store_id))
+
+                boxes = db.execute(
+                    "SELECT * FROM catalog_boxes WHERE store_id = ? ORDER BY position", (store_id,)
+                ).fetchall()
+
+                # rowid keeps the itemized prices in the order they were written
+                prices: Dict[int, List[Tuple[str, Any]]] = {}
+                for row in db.execute(
+                    "SELECT position, field, price FROM catalog_prices WHERE store_id = ? ORDER BY position, rowid",
+                    (store_id,)
+                ):
+                    prices.setdefault(row["position"], []).append((row["field"], row["price"]))
+
+                locations = {
+                    row["position"]: (row["x"], row["y"])
+                    for row in db.execute(
+                        "SELECT position, x, y FROM catalog_locations WHERE store_id = ?", (store_id,)
+                    )
+                }
+
+                depths: Dict[int, List[Any]] = {}
+                for row in db.execute(
+                    "SELECT position, depth FROM catalog_alternate_depths WHERE store_id = ? ORDER BY position, seq",
+                    (store_id,)
+                ):
+                    depths.setdefault(row["position"], []).append(row["depth"])
+            finally:
+                db.rollback()
+
+        data = json.loads(store["settings"]) if store["settings"] else {}
+        if store["pricing_mode"] is not None:
+            data = {"pricing-mode": store["pricing_mode"], **data}
+        data["boxes"] = [
+            _join_box(row, prices.get(row["position"], []), locations.get(row["position"]),
+                      depths.get(row["position"], []))
+            for row in boxes
+        ]
+        return store["revision"], data
+
+    def _write_box(self, db, store_id: str, position: int, box: Dict[str, Any]):
+        """Replace the rows of one box; the caller commits"""
+        if not isinstance(box, dict):
+            raise ValueError(f"Box {position} is not a mapping")
+        columns, prices, location, depths, extra = _split_box(box)
+        dimensions = columns.get("dimensions") or [None, None, None]
+
+        db.execute(
+            '''INSERT OR REPLACE INTO catalog_boxes
+               (store_id, position, type, supplier, model, dim0, dim1, dim2, open_dim, extra)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (store_id, position, columns.get("type"), columns.get("supplier"), columns.get("model"),
+             dimensions[0], dimensions[1], dimensions[2], columns.get("open_dim"),
+             json.dumps(extra) if extra else None)
+        )
+
+        db.execute("DELETE FROM catalog_prices WHERE store_id = ? AND position = ?", (store_id, position))
+        db.executemany(
+            "INSERT INTO catalog_prices (store_id, position, field, price) VALUES (?, ?, ?, ?)",
+            [(store_id, position, field, price) for field, price in prices]
+        )
+
+        if location is None:
+            db.execute("DELETE FROM catalog_locations WHERE store_id = ? AND position = ?", (store_id, position))
+        else:
+            db.execute(
+                "INSERT OR REPLACE INTO catalog_locations (store_id, position, x, y) VALUES (?, ?, ?, ?)",
+                (store_id, position, location[0], location[1])
+            )
+
+        db.execute("DELETE FROM catalog_alternate_depths WHERE store_id = ? AND position = ?", (store_id, position))
+        db.executemany(
+            "INSERT INTO catalog_alternate_depths (store_id, position, seq, depth) VALUES (?, ?, ?, ?)",
+            [(store_id, position, seq, depth) for seq, depth in enumerate(depths)]
+        )
+
+    def write(self, store_id: str, data: Dict[str, Any]):
+        """
+        Replace a whole store in one transaction
+
+        Raises:
+            ValueError: If data isn't a mapping with a list of box mappings
+        """
+        if not isinstance(data, dict) or not isinstance(data.get("boxes"), list):
+            raise ValueError("Store data must contain a 'boxes' list")
+
+        settings = {k: v for k, v in data.items() if k not in ("pricing-mode", "boxes")}
+        pricing_mode = data.get("pricing-mode")
+        if pricing_mode is not None and not isinstance(pricing_mode, str):
+            raise ValueError("pricing-mode must be a string")
+
+        with get_db() as db:
+            try:
+                db.execute(
+                    '''INSERT INTO catalog_stores (store_id, pricing_mode, settings) VALUES (?, ?, ?)
+                       ON CONFLICT (store_id) DO UPDATE SET
+                           pricing_mode = excluded.pricing_mode,
+                           settings = excluded.settings,
+                           revision = revision + 1''',
+                    (store_id, pricing_mode, json.dumps(settings) if settings else None)
+                )
+                for table in ("catalog_boxes", "catalog_prices", "catalog_locations", "catalog_alternate_depths"):
+                    db.execute(f"DELETE FROM {table} WHERE store_id = ?", (store_id,))
+                for position, box in enumerate(data["boxes"]):
+                    self._write_box(db, store_id, position, box)
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+
+    def update_boxes(self, store_id: str, boxes: Iterable[Tuple[int, Dict[str, Any]]]):
+        """
+        Rewrite only the rows of the given boxes, in one transaction
+
+        Args:
+            store_id: The store being edited
+            boxes: (position, box) pairs, positions as in the store's box list
+
+        Raises:
+            FileNotFoundError: If the store does not exist
+        """
+        with get_db() as db:
+            try:
+                updated = db.execute(
+                    "UPDATE catalog_stores SET revision = revision + 1 WHERE store_id = ?", (store_id,)
+                ).rowcount
+                if not updated:
+                    raise FileNotFoundError(self.describe(store_id))
+                for position, box in boxes:
+                    self._write_box(db, store_id, position, box)
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+
+
+def make_backend(name: str):
+    """
+    Create the backend with the given STORE_BACKEND name
+
+    Raises:
+        ValueError: If the name is unknown
+    """
+    if name == "yaml":
+        return YamlBackend()
+    if name == "sqlite":
+        return SqliteBackend()
+    raise ValueError(f"Unknown store backend: {name}")
+
+
+# The backend the app serves stores from
+backend = make_backend(BACKEND)
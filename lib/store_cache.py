@@ -0,0 +1,161 @@
+"""
+In-memory cache for parsed store catalogs
+
+Parsing stores/store{id}.yml with PyYAML's pure-Python loader costs a few
+milliseconds per request, so parsed stores are kept in memory keyed by store
+ID. Each entry remembers the stamp its storage backend reported for it (see
+store_backend) - the file's (st_mtime_ns, st_size) for YAML files, a revision
+number for SQLite - and is reloaded only when that stamp changes. For YAML
+files this also picks up hand edits made through the docker volume mount.
+
+Callers always get a deep copy, so request handlers can keep mutating the
+returned dict before saving it without corrupting the cached copy. Objects
+derived from a store (e.g. the packing engine's box arrays) can be cached next
+to it with load_derived and are rebuilt whenever the store changes.
+
+A store file's change journal (see store_journal), if there is one, is part of
+the file as far as the cache is concerned: the YAML backend applies it to the
+parsed data and its stamp is part of the entry's stamp.
+
+In write-behind mode a save doesn't touch the disk right away: the new file
+contents are staged here with stage() and served to readers until the flusher
+has written them out and calls unstage().
+"""
+
+import copy
+import itertools
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from lib import store_backend
+
+# store ID -> (backend stamp, parsed data, derived objects by name)
+_cache: Dict[str, Tuple[Any, Any, Dict[str, Any]]] = {}
+
+# store ID -> (file text, cache entry) for contents not yet written to disk
+_staged: Dict[str, Tuple[str, Tuple[Any, Any, Dict[str, Any]]]] = {}
+_staged_counter = itertools.count(1)
+
+
+def _staged_stamp(text: str) -> Tuple[Tuple[int, int], None]:
+    """
+    Make the stamp for a staged entry, shaped like a YAML backend stamp
+
+    Real stamps are ((st_mtime_ns, st_size), journal stamp) or, for SQLite, a
+    revision number. st_mtime_ns is never negative, so a staged stamp
+    ((-n, len(text)), None) can never equal a stamp read from disk, and the
+    counter makes every staging distinct from the one before it.
+    """
+    return ((-next(_staged_counter), len(text)), None)
+
+
+def _get_entry(store_id: str):
+    """Return the cache entry for a store, reloading it if it changed"""
+    staged = _staged.get(store_id)
+    if staged is not None:
+        return staged[1]
+
+    backend = store_backend.backend
+    stamp = backend.stamp(store_id)
+    if stamp is None:
+        invalidate(store_id)
+        raise FileNotFoundError(backend.describe(store_id))
+
+    entry = _cache.get(store_id)
+    if entry is None or entry[0] != stamp:
+        entry = (*backend.read(store_id), {})
+        _cache[store_id] = entry
+
+    return entry
+
+
+def load(store_id: str) -> Any:
+    """
+    Load a store through the cache
+
+    Args:
+        store_id: The store to load
+
+    Returns:
+        A deep copy of the store's data
+
+    Raises:
+        FileNotFoundError: If the store does not exist
+        yaml.YAMLError: If the store file cannot be parsed
+    """
+    return copy.deepcopy(_get_entry(store_id)[1])
+
+
+def load_derived(store_id: str, name: str, factory: Callable[[Any], Any]) -> Any:
+    """
+    Return an object built from a store, rebuilt only when the store changes
+
+    Args:
+        store_id: The store to build from
+        name: Name the derived object is cached under
+        factory: Builds the object from the store's data. It gets the cached
+                 data itself, so it must not mutate it.
+
+    Returns:
+        The shared derived object - callers must treat it as read-only
+
+    Raises:
+        FileNotFoundError: If the store does not exist
+        yaml.YAMLError: If the store file cannot be parsed
+    """
+    entry = _get_entry(store_id)
+    derived = entry[2]
+    if name not in derived:
+        derived[name] = factory(entry[1])
+    return derived[name]
+
+
+def version(store_id: str) -> Any:
+    """
+    Return the stamp of the cached version of a store, loading it if needed
+
+    Raises:
+        FileNotFoundError: If the store does not exist
+        yaml.YAMLError: If the store file cannot be parsed
+    """
+    return _get_entry(store_id)[0]
+
+
+def stage(store_id: str, text: str):
+    """
+    Serve new contents for a store file before they are written to disk
+
+    The text is parsed right away, so readers see exactly what the file will
+    contain once it's flushed, and the version doesn't change on flush.
+
+    Raises:
+        yaml.YAMLError: If the text cannot be parsed
+    """
+    data = yaml.safe_load(text)
+    _staged[store_id] = (text, (_staged_stamp(text), data, {}))
+
+
+def staged_stores() -> List[str]:
+    """Stores with staged contents waiting to be written"""
+    return list(_staged)
+
+
+def staged_text(store_id: str) -> Optional[str]:
+    """Return the staged contents of a store file, or None if nothing is staged"""
+    staged = _staged.get(store_id)
+    return staged[0] if staged is not None else None
+
+
+def unstage(store_id: str):
+    """Stop serving staged contents, once they have been written to the file"""
+    _staged.pop(store_id, None)
+    _cache.pop(store_id, None)
+
+
+def invalidate(store_id: Optional[str] = None):
+    """Drop one cached store, or the whole cache when no store is given"""
+    if store_id is None:
+        _cache.clear()
+    else:
+        _cache.pop(store_id, None)
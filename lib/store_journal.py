@@ -0,0 +1,192 @@
+"""
+Append-only change journals for store files
+
+With journaling on, price and location edits don't rewrite stores/store{id}.yml.
+Each change is appended as one JSON line to stores/store{id}.journal instead:
+
+    {"ts": "...", "store": "2", "model": "12C-UPS", "field": "prices.1", "old": 4.5, "new": 5.0}
+
+Fields are "prices.<level>", "itemized-prices.<name>" and "location". The
+store cache applies the journal on top of the YAML whenever either file
+changes, and compaction folds the journal back into the YAML and renames it to
+stores/store{id}.journal.<timestamp>. Together the archives and the live
+journal are a replayable history of every edit and who made it: apply() the
+entries of history() to a copy of the store from before the oldest archive to
+rebuild it as of any entry, or walk them backwards using "old" to undo edits.
+"""
+
+import glob
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from lib.catalog import legacy_model
+
+ITEMIZED_DEFAULTS = {
+    "box-price": 0,
+    "standard-materials": 0,
+    "standard-services": 0,
+    "fragile-materials": 0,
+    "fragile-services": 0,
+    "custom-materials": 0,
+    "custom-services": 0
+}
+
+
+def journal_path(yaml_file: str) -> str:
+    """Path of the journal that belongs to a store file"""
+    return os.path.splitext(yaml_file)[0] + ".journal"
+
+
+def make_entry(model: str, field: str, old: Any, new: Any, auth_store_id: Optional[str]) -> Dict[str, Any]:
+    """Build one journal entry"""
+    return {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "store": auth_store_id,
+        "model": model,
+        "field": field,
+        "old": old,
+        "new": new
+    }
+
+
+def append(path: str, entries: List[Dict[str, Any]]):
+    """Append entries to a journal and fsync it, so an acknowledged edit survives a crash"""
+    if not entries:
+        return
+    with open(path, "a") as f:
+        f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read(path: str) -> List[Dict[str, Any]]:
+    """
+    Read a journal's entries, oldest first
+
+    A torn last line from a crash mid-append is skipped; that edit was never
+    acknowledged.
+    """
+    try:
+        with open(path, "r") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+    entries = []
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            print(f"Skipping unreadable line {i + 1} of {path}")
+    return entries
+
+
+def _set_field(box: Dict[str, Any], field: str, value: Any):
+    if field == "location":
+        if value is None:
+            box.pop("location", None)
+        else:
+            box["location"] = value
+        return
+
+    key, _, name = field.partition(".")
+    if key == "prices":
+        box.setdefault("prices", [0, 0, 0, 0])[int(name)] = value
+    elif key == "itemized-prices":
+        box.setdefault("itemized-prices", dict(ITEMIZED_DEFAULTS))[name] = value
+    else:
+        raise ValueError(f"Unknown journal field: {field}")
+
+
+def apply(data: Dict[str, Any], entries: List[Dict[str, Any]]):
+    """
+    Apply journal entries to parsed store data in place
+
+    Like the update endpoints, an entry applies to every box with its model, and
+    legacy boxes get their model written out when their prices change.
+    """
+    if not entries:
+        return
+
+    boxes_by_model: Dict[str, List[Dict[str, Any]]] = {}
+    for box in data.get("boxes") or []:
+        if isinstance(box, dict) and isinstance(box.get("dimensions"), list) and len(box["dimensions"]) == 3:
+            model = box["model"] if "model" in box else legacy_model(box["dimensions"])
+            boxes_by_model.setdefault(model, []).append(box)
+
+    for entry in entries:
+        for box in boxes_by_model.get(entry["model"], ()):
+            _set_field(box, entry["field"], entry["new"])
+            if entry["field"] != "location" and "model" not in box:
+                box["model"] = entry["model"]
+
+
+def diff_box(model: str, old: Dict[str, Any], new: Dict[str, Any],
+             auth_store_id: Optional[str]) -> List[Dict[str, Any]]:
+    """Journal entries for the price and location changes between two versions of a box"""
+    entries = []
+
+    old_prices, new_prices = old.get("prices") or [], new.get("prices") or []
+    for i, value in enumerate(new_prices):
+        previous = old_prices[i] if i < len(old_prices) else None
+        if value != previous:
+            entries.append(make_entry(model, f"prices.{i}", previous, value, auth_store_id))
+
+    old_itemized, new_itemized = old.get("itemized-prices") or {}, new.get("itemized-prices") or {}
+    for name, value in new_itemized.items():
+        if value != old_itemized.get(name):
+            entries.append(make_entry(model, f"itemized-prices.{name}", old_itemized.get(name), value, auth_store_id))
+
+    if old.get("location") != new.get("location"):
+        entries.append(make_entry(model, "location", old.get("location"), new.get("location"), auth_store_id))
+
+    return entries
+
+
+def archive(path: str) -> Optional[str]:
+    """
+    Move a journal aside once it has been folded into the store file
+
+    The journal is renamed to <journal>.<timestamp>, so compaction keeps the
+    history instead of deleting it. The rename is atomic: after a crash the
+    entries are either still in the live journal or in the archive, never both.
+
+    Returns:
+        The archive's path, or None if there was no journal
+    """
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    archive_path = f"{path}.{stamp}"
+    suffix = 1
+    while os.path.exists(archive_path):
+        archive_path = f"{path}.{stamp}-{suffix}"
+        suffix += 1
+    try:
+        os.replace(path, archive_path)
+    except FileNotFoundError:
+        return None
+    return archive_path
+
+
+def archives(path: str) -> List[str]:
+    """Archived journals of a journal path, oldest first"""
+    return sorted(glob.glob(glob.escape(path) + ".*"))
+
+
+def history(path: str) -> List[Dict[str, Any]]:
+    """
+    Every entry ever journaled for a store, oldest first
+
+    Args:
+        path: The store's journal path (see journal_path)
+
+    Returns:
+        The entries of each archive in turn, then those of the live journal
+    """
+    entries = []
+    for archived in archives(path):
+        entries += read(archived)
+    return entries + read(path)
@@ -0,0 +1,63 @@
+"""
+Per-store write locks
+
+Every write to a store file is a read-modify-write cycle: load the YAML,
+apply the changes, save it back. Two of those running at once for the same
+store would each save their own copy and the first one's edits would be lost,
+so writers hold the store's lock for the whole cycle. Each store has its own
+lock, so writes to different stores still run in parallel.
+
+The route handlers run on worker threads, so these are threading locks. With
+several uvicorn worker processes, set STORE_FILE_LOCKS=1 to additionally take
+an fcntl lock on stores/.store{id}.lock, which serializes writers across
+processes. The YAML file itself can't carry the lock because atomic writes
+replace it with a new inode.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+FILE_LOCKS = os.environ.get('STORE_FILE_LOCKS', '0') == '1' and fcntl is not None
+
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def get_lock(store_id: str) -> threading.Lock:
+    """Return the lock of a store, creating it on first use"""
+    with _registry_lock:
+        lock = _locks.get(store_id)
+        if lock is None:
+            lock = _locks[store_id] = threading.Lock()
+        return lock
+
+
+@contextmanager
+def store_write_lock(store_id: str, stores_dir: str = "stores") -> Iterator[None]:
+    """
+    Hold the write lock of a store for the duration of the block
+
+    Not reentrant - don't take the same store's lock twice on one thread.
+
+    Args:
+        store_id: The store being written
+        stores_dir: Directory holding the store files and lock files
+    """
+    with get_lock(store_id):
+        if not FILE_LOCKS:
+            yield
+            return
+
+        with open(os.path.join(stores_dir, f".store{store_id}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -1,28 +1,135 @@
+import asyncio
+import copy
 import json
+import logging
+import math
 import os
 import re
+from contextlib import asynccontextmanager
 from typing import Any, Dict, List, Optional, Union
 
+import anyio
 import yaml
-from fastapi import Body, FastAPI, HTTPException, Path, Request, File, UploadFile, Depends
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from fastapi import Body, FastAPI, Header, HTTPException, Path, Query, Request, File, UploadFile, Depends
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-import aiofiles
 import shutil
 
-from lib.auth_middleware import require_store_auth, get_current_store
+from lib import catalog, pack_cache, packing, store_backend, store_cache, store_journal
+from lib.atomic_file import atomic_write
+from lib.store_locks import store_write_lock
+from lib.auth_middleware import bearer_scheme, require_store_auth, get_current_store
 from lib.auth_manager import (
-    init_db, verify_store_password, create_session, 
-    create_store_auth, verify_session, delete_session,
+    init_db, get_password_hash, check_password, log_login_attempt, AuthBusyError,
+    create_session, create_store_auth, verify_session, delete_session,
+    start_audit_writer, stop_audit_writer, sweep_expired_sessions, count_live_sessions,
+    rollup_audit_log,
     hasAuth as store_has_auth
 )
 
+# Background jobs report through this logger, to stderr with a timestamp; LOG_LEVEL sets its level
+logger = logging.getLogger("packing_website")
+if not logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_log_handler)
+    logger.propagate = False
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
 # Initialize the authentication database
 init_db()
 
-app = FastAPI()
+# Stores are served from stores/store{id}.yml by default, or from SQLite with STORE_BACKEND=sqlite
+# (see lib/store_backend.py; tools/manage_stores.py moves stores between the two)
+stores = store_backend.backend
+stores.init()
+
+# Handlers that touch the disk, YAML or SQLite are plain `def`s, which Starlette runs on a
+# worker thread pool instead of the event loop. anyio's default pool has 40 threads.
+THREADPOOL_SIZE = int(os.environ.get('THREADPOOL_SIZE', '40'))
+
+# Journal mode: price and location edits are appended to stores/store{id}.journal instead of
+# rewriting the YAML, and folded back into it once the journal reaches JOURNAL_COMPACT_BYTES,
+# every JOURNAL_COMPACT_SECONDS and on shutdown. Compacted journals are kept as
+# stores/store{id}.journal.<timestamp>.
+# The SQLite backend already writes single rows, so journal and write-behind modes are YAML-only.
+JOURNAL_ENABLED = stores.name == "yaml" and os.environ.get('STORE_JOURNAL', '0') == '1'
+JOURNAL_COMPACT_BYTES = int(os.environ.get('STORE_JOURNAL_COMPACT_BYTES', str(256 * 1024)))
+JOURNAL_COMPACT_SECONDS = float(os.environ.get('STORE_JOURNAL_COMPACT_SECONDS', '300'))
+
+# Write-behind mode: saves are applied in memory and acknowledged right away, and each store
+# is written to disk at most once per this many seconds, and on shutdown. 0 writes immediately.
+# Journal mode already makes edits cheap, so it turns write-behind off.
+WRITE_BEHIND_SECONDS = 0 if JOURNAL_ENABLED or stores.name != "yaml" else float(os.environ.get('STORE_WRITE_BEHIND_SECONDS', '0'))
+
+# Expired login sessions are deleted in the background every this many seconds
+SESSION_SWEEP_SECONDS = float(os.environ.get('SESSION_SWEEP_SECONDS', '300'))
+
+# Delete expired login sessions and report how many are still live
+def sweep_sessions():
+    try:
+        deleted = sweep_expired_sessions()
+        live = count_live_sessions()
+        # The counts are also attached to the record for handlers that collect metrics
+        logger.info("Session sweep: removed %d expired sessions, %d live", deleted, sum(live.values()),
+                    extra={"sessions_removed": deleted, "sessions_live": live})
+    except Exception:
+        logger.exception("Error sweeping sessions")
+
+# Old audit log rows are rolled up into daily counts every this many seconds
+# (AUDIT_RETENTION_DAYS sets the age)
+AUDIT_ROLLUP_SECONDS = float(os.environ.get('AUDIT_ROLLUP_SECONDS', '3600'))
+
+# Roll old audit log rows into daily counts
+def rollup_audit():
+    try:
+        rolled_up = rollup_audit_log()
+        if rolled_up:
+            print(f"Audit rollup: rolled {rolled_up} old audit log rows into daily counts")
+    except Exception as e:
+        print(f"Error rolling up audit log: {str(e)}")
+
+async def run_periodically(interval: float, func):
+    while True:
+        await asyncio.sleep(interval)
+        await run_in_threadpool(func)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+    # Audit events are queued and written in batches while the app runs
+    start_audit_writer()
+
+    tasks = []
+    if WRITE_BEHIND_SECONDS > 0:
+        tasks.append(asyncio.create_task(run_periodically(WRITE_BEHIND_SECONDS, flush_staged_stores)))
+    if JOURNAL_ENABLED:
+        tasks.append(asyncio.create_task(run_periodically(JOURNAL_COMPACT_SECONDS, compact_store_journals)))
+    if SESSION_SWEEP_SECONDS > 0:
+        tasks.append(asyncio.create_task(run_periodically(SESSION_SWEEP_SECONDS, sweep_sessions)))
+    if AUDIT_ROLLUP_SECONDS > 0:
+        tasks.append(asyncio.create_task(run_periodically(AUDIT_ROLLUP_SECONDS, rollup_audit)))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        # Don't lose staged changes on shutdown, and leave the YAML files complete
+        await run_in_threadpool(flush_staged_stores)
+        if JOURNAL_ENABLED:
+            await run_in_threadpool(compact_store_journals)
+        # Write out every queued audit event before exiting
+        await run_in_threadpool(stop_audit_writer)
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount static directories
 app.mount("/assets", StaticFiles(directory="assets"), name="assets")
@@ -31,7 +138,7 @@ app.mount("/components", StaticFiles(directory="components"), name="components")
 
 # Define static asset routes for compatibility with existing code
 @app.get("/index.js", response_class=HTMLResponse)
-async def base_script():
+def base_script():
     # Add cache-busting headers
     headers = {
         "Cache-Control": "no-cache, no-store, must-revalidate",
@@ -42,7 +149,7 @@ async def base_script():
         return HTMLResponse(f.read(), media_type="text/javascript", headers=headers)
 
 @app.get("/pricing.js", response_class=HTMLResponse)
-async def pricing_script():
+def pricing_script():
     # Serve pricing module from lib/pricing.js
     headers = {
         "Cache-Control": "no-cache, no-store, must-revalidate",
@@ -53,7 +160,7 @@ async def pricing_script():
         return HTMLResponse(f.read(), media_type="text/javascript", headers=headers)
 
 @app.get("/packing.js", response_class=HTMLResponse)
-async def packing_script():
+def packing_script():
     # Serve packing module from lib/packing.js
     headers = {
         "Cache-Control": "no-cache, no-store, must-revalidate",
@@ -64,7 +171,7 @@ async def packing_script():
         return HTMLResponse(f.read(), media_type="text/javascript", headers=headers)
 
 @app.get("/api.js", response_class=HTMLResponse)
-async def api_script():
+def api_script():
     # Serve api module from lib/api.js
     headers = {
         "Cache-Control": "no-cache, no-store, must-revalidate",
@@ -75,7 +182,7 @@ async def api_script():
         return HTMLResponse(f.read(), media_type="text/javascript", headers=headers)
 
 @app.get("/location.js", response_class=HTMLResponse)
-async def location_script():
+def location_script():
     # Serve location module from lib/location.js
     headers = {
         "Cache-Control": "no-cache, no-store, must-revalidate",
@@ -97,10 +204,9 @@ async def root():
 
 # Login page route
 @app.get("/{store_id}/login", response_class=HTMLResponse)
-async def login_page(store_id: str = Path(..., regex=r"^\d{1,4}$")):
-    # Check if the store's YAML file exists
-    yaml_file = f"stores/store{store_id}.yml"
-    if not os.path.exists(yaml_file):
+def login_page(store_id: str = Path(..., regex=r"^\d{1,4}$")):
+    # Check if the store exists
+    if not stores.exists(store_id):
         raise HTTPException(status_code=404, detail=f"Store configuration not found for store {store_id}")
         
     # Load the login HTML
@@ -109,15 +215,14 @@ async def login_page(store_id: str = Path(..., regex=r"^\d{1,4}$")):
 
 # Catch-all pattern should be last to avoid conflicts
 @app.get("/{store_id}", response_class=HTMLResponse)
-async def store_page(store_id: str = Path(..., regex=r"^\d{1,4}$")):
+def store_page(store_id: str = Path(..., regex=r"^\d{1,4}$")):
     with open("index.html", "r") as f:
         return f.read()
 
 @app.get("/{store_id}/price_editor", response_class=HTMLResponse)
-async def price_editor(store_id: str = Path(..., regex=r"^\d{1,4}$")):
-    # Check if the store's YAML file exists
-    yaml_file = f"stores/store{store_id}.yml"
-    if not os.path.exists(yaml_file):
+def price_editor(store_id: str = Path(..., regex=r"^\d{1,4}$")):
+    # Check if the store exists
+    if not stores.exists(store_id):
         raise HTTPException(status_code=404, detail=f"Store configuration not found for store {store_id}")
 
     # Load the price editor HTML
@@ -138,20 +243,19 @@ async def price_editor(store_id: str = Path(..., regex=r"^\d{1,4}$")):
 
 # New route structure for admin pages - all protected by auth
 @app.get("/{store_id}/prices", response_class=HTMLResponse)
-async def prices_page(
+def prices_page(
     store_id: str = Path(..., regex=r"^\d{1,4}$")
 ):
     # Forward to existing price_editor for now
     # Eventually this will point to admin/prices/index.html
-    return await price_editor(store_id)
+    return price_editor(store_id)
 
 @app.get("/{store_id}/floorplan", response_class=HTMLResponse)
-async def floorplan_page(
+def floorplan_page(
     store_id: str = Path(..., regex=r"^\d{1,4}$")
 ):
-    # Check if the store's YAML file exists
-    yaml_file = f"stores/store{store_id}.yml"
-    if not os.path.exists(yaml_file):
+    # Check if the store exists
+    if not stores.exists(store_id):
         raise HTTPException(status_code=404, detail=f"Store configuration not found for store {store_id}")
 
     # Load the floorplan HTML
@@ -159,26 +263,29 @@ async def floorplan_page(
         return HTMLResponse(f.read())
 
 @app.get("/api/store/{store_id}/pricing_mode", response_class=JSONResponse)
-async def get_pricing_mode(store_id: str = Path(..., regex=r"^\d{1,4}$")):
-    data = load_store_yaml(store_id)
-    pricing_mode = data.get("pricing-mode", "standard")
-    return {"mode": pricing_mode}
+def get_pricing_mode(response: Response, store_id: str = Path(..., regex=r"^\d{1,4}$")):
+    snapshot = load_store_catalog(store_id)
+    response.headers[CATALOG_VERSION_HEADER] = snapshot.version
+    return {"mode": snapshot.pricing_mode}
 
 @app.get("/api/store/{store_id}/boxes", response_class=JSONResponse)
-async def get_boxes(store_id: str = Path(..., regex=r"^\d{1,4}$")):
-    yaml_file = f"stores/store{store_id}.yml"
+def get_boxes(request: Request, store_id: str = Path(..., regex=r"^\d{1,4}$")):
+    # Every box was validated when the store file was compiled
+    return catalog_response(request, load_store_catalog(store_id), "boxes")
+
 
-    if not os.path.exists(yaml_file):
-        error_msg = f"Store configuration file not found at {yaml_file}"
+# Helper function to load and validate YAML
+def load_store_yaml(store_id: str):
+    # Parsed stores are cached in memory and only re-read when they change
+    try:
+        boxes_data = store_cache.load(store_id)
+    except FileNotFoundError:
+        error_msg = f"Store configuration file not found at {stores.describe(store_id)}"
         print(f"Error: {error_msg}")
         raise HTTPException(status_code=404, detail=error_msg)
-
-    with open(yaml_file, "r") as f:
-        try:
-            boxes_data = yaml.safe_load(f)
-        except Exception as e:
-            print(f"YAML parsing error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"YAML parsing error: {str(e)}")
+    except Exception as e:
+        print(f"YAML parsing error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"YAML parsing error: {str(e)}")
 
     # Validate the structure of the YAML data
     if not boxes_data or "boxes" not in boxes_data or not isinstance(boxes_data["boxes"], list):
@@ -186,368 +293,351 @@ async def get_boxes(store_id: str = Path(..., regex=r"^\d{1,4}$")):
         print(f"Error: {error_msg}")
         raise HTTPException(status_code=500, detail=error_msg)
 
-    # Determine pricing mode
-    pricing_mode = boxes_data.get("pricing-mode", "standard")
-
-    # Validate each box entry
-    for i, box in enumerate(boxes_data["boxes"]):
-        if "type" not in box:
-            raise HTTPException(status_code=500, detail=f"Box at index {i} missing 'type' field")
-        if "dimensions" not in box or not isinstance(box["dimensions"], list) or len(box["dimensions"]) != 3:
-            raise HTTPException(status_code=500, detail=f"Box at index {i} has invalid 'dimensions' (must be list of 3 numbers)")
-        
-        # Validate pricing data based on pricing mode
-        if pricing_mode == "standard":
-            if "prices" not in box or not isinstance(box["prices"], list) or len(box["prices"]) != 4:
-                raise HTTPException(status_code=500, detail=f"Box at index {i} has invalid 'prices' (must be list of 4 numbers)")
-            
-            if "itemized-prices" in box:
-                raise HTTPException(status_code=500, detail=f"Box at index {i} has 'itemized-prices' but store is in standard pricing mode")
-        else:  # itemized pricing mode
-            if "itemized-prices" not in box or not isinstance(box["itemized-prices"], dict):
-                raise HTTPException(status_code=500, detail=f"Box at index {i} missing 'itemized-prices' (must be an object)")
-            
-            # Validate required itemized pricing fields
-            required_fields = ["box-price", "standard-materials", "standard-services", 
-                              "fragile-materials", "fragile-services", 
-                              "custom-materials", "custom-services"]
-            
-            for field in required_fields:
-                if field not in box["itemized-prices"]:
-                    raise HTTPException(status_code=500, detail=f"Box at index {i} missing required field '{field}' in itemized-prices")
-            
-            if "prices" in box:
-                raise HTTPException(status_code=500, detail=f"Box at index {i} has 'prices' but store is in itemized pricing mode")
-        
-        if box["type"] == "CustomBox" and "open_dim" not in box:
-            raise HTTPException(status_code=500, detail=f"Box at index {i} is CustomBox but missing 'open_dim' field")
-
-        # Optional fields validation
-        if "supplier" in box and not isinstance(box["supplier"], str):
-            raise HTTPException(status_code=500, detail=f"Box at index {i} has invalid 'supplier' (must be a string)")
-        if "model" in box and not isinstance(box["model"], str):
-            raise HTTPException(status_code=500, detail=f"Box at index {i} has invalid 'model' (must be a string)")
-        # Location must be a dictionary, string, or empty/missing
-        if "location" in box:
-            # Handle None or empty value by converting to empty dict
-            if box["location"] is None:
-                box["location"] = {}
-                
-            # Check type
-            if not isinstance(box["location"], (str, dict)):
-                raise HTTPException(status_code=500, detail=f"Box at index {i} has invalid 'location' (must be a dictionary or string)")
-                
-            # If location is a dict, validate its structure
-            if isinstance(box["location"], dict):
-                location = box["location"]
-                
-                # If coords are present, validate them
-                if "coords" in location and location["coords"] is not None:
-                    coords = location["coords"]
-                    if not isinstance(coords, list) or len(coords) != 2:
-                        raise HTTPException(status_code=500, detail=f"Box at index {i} has invalid 'location.coords' (must be a list of 2 numbers)")
-                    if not all(isinstance(coord, (int, float)) for coord in coords):
-                        raise HTTPException(status_code=500, detail=f"Box at index {i} has invalid coordinate values (must be numbers)")
-                        
-                # We don't use labels anymore, but if present should be a string
-                if "label" in location and location["label"] is not None and not isinstance(location["label"], str):
-                    raise HTTPException(status_code=500, detail=f"Box at index {i} has invalid 'location.label' (must be a string)")
-        if "alternate_depths" in box:
-            if not isinstance(box["alternate_depths"], list):
-                raise HTTPException(status_code=500, detail=f"Box at index {i} has invalid 'alternate_depths' (must be a list of numbers)")
-            for depth in box["alternate_depths"]:
-                if not isinstance(depth, (int, float)):
-                    raise HTTPException(status_code=500, detail=f"Box at index {i} has invalid value in 'alternate_depths' (must be numbers)")
 
     return boxes_data
 
-
-# Helper function to load and validate YAML
-def load_store_yaml(store_id: str):
-    yaml_file = f"stores/store{store_id}.yml"
-
-    if not os.path.exists(yaml_file):
-        error_msg = f"Store configuration file not found at {yaml_file}"
+# Helper function to get the compiled, validated snapshot of a store
+def load_store_catalog(store_id: str) -> catalog.StoreCatalog:
+    # Validated and compiled once per version of the store and shared between requests
+    try:
+        return store_cache.load_derived(store_id, "catalog", catalog.compile_store)
+    except FileNotFoundError:
+        error_msg = f"Store configuration file not found at {stores.describe(store_id)}"
         print(f"Error: {error_msg}")
         raise HTTPException(status_code=404, detail=error_msg)
+    except yaml.YAMLError as e:
+        print(f"YAML parsing error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"YAML parsing error: {str(e)}")
+    except catalog.CatalogError as e:
+        print(f"Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Helper function to get an editable copy of a store file together with its snapshot
+def load_store_for_update(store_id: str):
+    # The copy comes from the snapshot itself, so positions in the model index line up with
+    # data["boxes"] even if the file changes meanwhile
+    snapshot = load_store_catalog(store_id)
+    return copy.deepcopy(snapshot.config), snapshot
+
+# Read endpoints report the catalog version here; edits send it back in If-Match
+CATALOG_VERSION_HEADER = "X-Catalog-Version"
+
+# Reject an edit based on an older version of the store than the current one
+def check_catalog_version(snapshot: catalog.StoreCatalog, if_match: Optional[str], expected_version: Optional[str]):
+    expected = []
+    if expected_version:
+        expected.append(expected_version)
+    if if_match:
+        # Accept quoted and weak forms too; * matches any version
+        for tag in if_match.split(","):
+            tag = tag.strip()
+            expected.append((tag[2:] if tag.startswith("W/") else tag).strip('"'))
+
+    # Clients that don't send a version keep the old last-writer-wins behavior
+    if expected and "*" not in expected and snapshot.version not in expected:
+        raise HTTPException(
+            status_code=409,
+            detail="The store was changed by someone else since it was loaded. Reload and try again.",
+            headers={CATALOG_VERSION_HEADER: snapshot.version}
+        )
 
-    with open(yaml_file, "r") as f:
-        try:
-            boxes_data = yaml.safe_load(f)
-        except Exception as e:
-            print(f"YAML parsing error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"YAML parsing error: {str(e)}")
-
-    # Validate the structure of the YAML data
-    if not boxes_data or "boxes" not in boxes_data or not isinstance(boxes_data["boxes"], list):
-        error_msg = "Invalid YAML structure: must contain a 'boxes' list"
+# Serve a pre-encoded snapshot payload, or 304 when the client already has this version
+def catalog_response(request: Request, snapshot: catalog.StoreCatalog, name: str) -> Response:
+    encoded = snapshot.responses[name]
+    # Clients may cache the body but must revalidate it on every use
+    headers = {"ETag": encoded.etag, "Cache-Control": "no-cache", CATALOG_VERSION_HEADER: snapshot.version}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # If-None-Match uses the weak comparison, so a W/ prefix still matches
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in tags or encoded.etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags):
+            return Response(status_code=304, headers=headers)
+
+    return Response(content=encoded.body, media_type="application/json", headers=headers)
+
+# Helper function to get the packing engine's view of a store's boxes, with the catalog version
+def load_box_catalog(store_id: str):
+    # The version is read before the snapshot, so a write landing in between can only file
+    # results under a stale version
+    try:
+        version = store_cache.version(store_id)
+    except FileNotFoundError:
+        error_msg = f"Store configuration file not found at {stores.describe(store_id)}"
         print(f"Error: {error_msg}")
-        raise HTTPException(status_code=500, detail=error_msg)
-
+        raise HTTPException(status_code=404, detail=error_msg)
+    except yaml.YAMLError as e:
+        print(f"YAML parsing error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"YAML parsing error: {str(e)}")
 
-    return boxes_data
+    return version, load_store_catalog(store_id).box_catalog
 
 # Helper function to save YAML data
 def save_store_yaml(store_id: str, data: dict):
-    yaml_file = f"stores/store{store_id}.yml"
-
     try:
-        # Custom YAML writing to maintain the desired format
-        with open(yaml_file, "w") as f:
-            # Write pricing mode if present
-            if "pricing-mode" in data:
-                f.write(f"pricing-mode: {data['pricing-mode']}\n")
-            
-            f.write("boxes:\n")
-
-            # Determine pricing mode
-            pricing_mode = data.get("pricing-mode", "standard")
-
-            # Write each box in a nice format
-            for box in data["boxes"]:
-                # Always write the type
-                f.write(f"  - type: {box['type']}\n")
-
-                # Handle supplier field
-                if store_id == "1" and "supplier" not in box:
-                    # Skip supplier field for store1 if not present to maintain legacy format
-                    pass
-                else:
-                    supplier = box.get('supplier', 'Unknown')
-                    f.write(f"    supplier: {supplier}\n")
+        # Fold any journal in first: replaying it over this save after a crash could undo the save
+        compact_store_journal(store_id)
 
-                # Handle model field
-                if store_id == "1" and "model" not in box:
-                    # Skip model field for store1 if not present to maintain legacy format
-                    pass
-                else:
-                    model = box.get('model', f"Unknown-{box['dimensions'][0]}-{box['dimensions'][1]}-{box['dimensions'][2]}")
-                    f.write(f"    model: \"{model}\"\n")
-
-                # Safely format dimensions with square brackets and commas, no spaces
-                # Use a safer approach to prevent YAML injection
-                if isinstance(box['dimensions'], list) and len(box['dimensions']) == 3:
-                    dimensions = [float(d) if isinstance(d, (int, float)) else 0 for d in box['dimensions']]
-                    dimensions_str = str(dimensions).replace(" ", "")
-                    f.write(f"    dimensions: {dimensions_str}\n")
-                else:
-                    f.write(f"    dimensions: [0,0,0]\n")
-
-                # Add alternate_depths if present
-                if "alternate_depths" in box and isinstance(box['alternate_depths'], list):
-                    # Validate depths are numeric and reasonable
-                    alt_depths = [float(d) if isinstance(d, (int, float)) and 0 <= d <= 100 else 0 for d in box['alternate_depths']]
-                    alt_depths_str = str(alt_depths).replace(" ", "")
-                    f.write(f"    alternate_depths: {alt_depths_str}\n")
-
-                # Write prices or itemized-prices based on pricing mode
-                if pricing_mode == "standard" and "prices" in box:
-                    # Safely format prices with square brackets and commas, no spaces
-                    if isinstance(box['prices'], list) and len(box['prices']) == 4:
-                        # Validate prices are numeric and in reasonable range
-                        prices = [float(p) if isinstance(p, (int, float)) and 0 <= p <= 10000 else 0 for p in box['prices']]
-                        prices_str = str(prices).replace(" ", "")
-                        f.write(f"    prices: {prices_str}\n")
-                    else:
-                        f.write(f"    prices: [0.0,0.0,0.0,0.0]\n")
-                elif pricing_mode == "itemized" and "itemized-prices" in box:
-                    # Write itemized prices
-                    ip = box["itemized-prices"]
-                    f.write(f"    itemized-prices:\n")
-                    f.write(f"      box-price: {ip.get('box-price', 0)}\n")
-                    f.write(f"      standard-materials: {ip.get('standard-materials', 0)}\n")
-                    f.write(f"      standard-services: {ip.get('standard-services', 0)}\n")
-                    f.write(f"      fragile-materials: {ip.get('fragile-materials', 0)}\n")
-                    f.write(f"      fragile-services: {ip.get('fragile-services', 0)}\n")
-                    f.write(f"      custom-materials: {ip.get('custom-materials', 0)}\n")
-                    f.write(f"      custom-services: {ip.get('custom-services', 0)}\n")
-
-                # Add location if present
-                if store_id == "1" and "location" not in box:
-                    # Skip location field for store1 if not present to maintain legacy format
-                    pass
-                else:
-                    location = box.get('location', {})
-                    
-                    # Handle empty or None locations - skip entirely
-                    if location is None or (isinstance(location, dict) and not location):
-                        # Skip empty locations completely
-                        pass
-                    # Handle dictionary with coords
-                    elif isinstance(location, dict) and 'coords' in location and location['coords']:
-                        # Start location section
-                        f.write(f"    location:\n")
-                        
-                        coords = location['coords']
-                        # Ensure coords are floats and valid
-                        if isinstance(coords, list) and len(coords) == 2:
-                            x = float(coords[0]) if isinstance(coords[0], (int, float)) else 0
-                            y = float(coords[1]) if isinstance(coords[1], (int, float)) else 0
-                            f.write(f"      coords: [{x}, {y}]\n")
-                    # Handle legacy string locations (skip completely)
-                    elif isinstance(location, str) and location.strip():
-                        # Skip legacy string locations
-                        pass
-
-                f.write("\n")
+        if WRITE_BEHIND_SECONDS > 0:
+            # Readers see the change right away; the flusher writes it out later
+            store_cache.stage(store_id, store_backend.render_store_yaml(store_id, data))
+        else:
+            stores.write(store_id, data)
 
         return True
     except Exception as e:
         print(f"Error saving YAML: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error saving YAML: {str(e)}")
+    finally:
+        # Don't rely on the mtime alone - a same-size rewrite can land in the same tick
+        store_cache.invalidate(store_id)
+        pack_cache.invalidate(store_id)
+
+# Fold a store's journal into its YAML file and archive the journal; the caller must hold
+# the store's write lock
+def compact_store_journal(store_id: str):
+    if stores.name != "yaml":
+        return
+    journal_file = store_journal.journal_path(stores.path(store_id))
+    if not os.path.exists(journal_file):
+        return
+
+    # The cached data already has the journal applied. Should we crash between the two
+    # steps, replaying the journal over the compacted file changes nothing.
+    stores.write(store_id, load_store_yaml(store_id))
+    store_journal.archive(journal_file)
+    store_cache.invalidate(store_id)
+
+# Compact every store that has a journal
+def compact_store_journals():
+    for name in os.listdir("stores"):
+        match = re.fullmatch(r"store(\d+)\.journal", name)
+        if not match:
+            continue
+        try:
+            with store_write_lock(match.group(1)):
+                compact_store_journal(match.group(1))
+        except Exception as e:
+            print(f"Error compacting {name}: {str(e)}")
 
-# Define box sections based on model patterns or box type
-def get_box_section(model: str, box_type: str = None):
-    # First try to categorize based on model if it exists
-    if model and model.strip():
-        if any(model.endswith(suffix) for suffix in ["C-UPS", "C", "Cube"]):
-            return "CUBE"
-        elif any(x in model for x in ["X 4", "X 3", "X 6", "J-11", "J-14", "J-15", "J-16", "SHIRTB"]):
-            return "FLAT & SMALL"
-        elif any(x in model for x in ["J-20", "WREATH", "ST-6", "MIR-3", "MIR-8"]):
-            return "MEDIUM"
-        elif any(x in model for x in ["J-64", "SUITCASE", "VCR", "24 X 18 X 18"]):
-            return "LARGE"
-        else:
-            return "SPECIALTY"
-            
-    # If no model or couldn't categorize, use box type
-    if box_type:
-        if box_type == "NormalBox":
-            return "NORMAL"
-        elif box_type == "CustomBox":
-            return "CUSTOM"
-            
-    # Fallback
-    return "OTHER"
-
-# Get boxes formatted for the editor with sections
-@app.get("/api/store/{store_id}/boxes_with_sections", response_class=JSONResponse)
-async def get_boxes_with_sections(store_id: str = Path(..., regex=r"^\d{1,4}$")):
-    data = load_store_yaml(store_id)
-    result = []
-    
-    # Determine pricing mode
-    pricing_mode = data.get("pricing-mode", "standard")
+# Save edited boxes: update the rows or journal the changes of the touched boxes, or rewrite
+# the whole file
+def commit_store_changes(store_id: str, data: dict, snapshot: catalog.StoreCatalog,
+                         touched: List[int], auth_store_id: str):
+    if stores.name == "sqlite":
+        try:
+            stores.update_boxes(store_id, [(position, data["boxes"][position]) for position in sorted(set(touched))])
+        except Exception as e:
+            print(f"Error updating store: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error updating store: {str(e)}")
+        finally:
+            store_cache.invalidate(store_id)
+            pack_cache.invalidate(store_id)
+        return
+
+    if not JOURNAL_ENABLED:
+        save_store_yaml(store_id, data)
+        return
 
-    for box in data["boxes"]:
-        # Handle legacy format (missing model and location)
-        model = box.get("model", f"Unknown-{len(box['dimensions'])}-{box['dimensions'][0]}-{box['dimensions'][1]}-{box['dimensions'][2]}")
+    journal_file = store_journal.journal_path(stores.path(store_id))
+    entries = []
+    for position in sorted(set(touched)):
+        box = snapshot.boxes[position]
+        # Journal the box as a full save would have written it, so both modes serve the same data
+        edited = store_backend.normalize_box(store_id, data["boxes"][position], data.get("pricing-mode"))
+        entries += store_journal.diff_box(box.model, box.config, edited, auth_store_id)
 
-        # Get section based on model or box type
-        box_type = box.get("type")
-        section = get_box_section(model, box_type)
-        
-        # Only print debug info for store1
-        if store_id == "1":
-            print(f"Store1 - Model: {model}, Type: {box_type}, Section: {section}")
+    try:
+        store_journal.append(journal_file, entries)
+    except Exception as e:
+        print(f"Error writing journal: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error writing journal: {str(e)}")
+    finally:
+        store_cache.invalidate(store_id)
+        pack_cache.invalidate(store_id)
+
+    if entries and os.path.getsize(journal_file) >= JOURNAL_COMPACT_BYTES:
+        compact_store_journal(store_id)
+
+# Write a store's staged changes to disk
+def flush_store_yaml(store_id: str):
+    # Saves stage under the same lock, so nothing can be staged between writing and unstaging
+    with store_write_lock(store_id):
+        text = store_cache.staged_text(store_id)
+        if text is None:
+            return
+        stores.write_text(store_id, text)
+        store_cache.unstage(store_id)
+
+# Write every store with staged changes, keeping the changes staged if a write fails
+def flush_staged_stores():
+    for store_id in store_cache.staged_stores():
+        try:
+            flush_store_yaml(store_id)
+        except Exception as e:
+            print(f"Error flushing store {store_id}: {str(e)}")
 
-        dimensions_str = "x".join(str(d) for d in box["dimensions"])
-        
-        # Process based on pricing mode
-        if pricing_mode == "standard":
-            prices = box.get("prices", [0, 0, 0, 0])
-            box_data = {
-                "section": section,
-                "model": model,
-                "dimensions": dimensions_str,
-                "box_price": prices[0],
-                "standard": prices[1],
-                "fragile": prices[2],
-                "custom": prices[3],
-                "location": box.get("location", "???"),
-                "pricing_mode": "standard"
-            }
-        else:  # itemized pricing mode
-            ip = box.get("itemized-prices", {})
-            
-            # Calculate totals for each level
-            box_price = ip.get("box-price", 0)
-            standard_total = box_price + ip.get("standard-materials", 0) + ip.get("standard-services", 0)
-            fragile_total = box_price + ip.get("fragile-materials", 0) + ip.get("fragile-services", 0) 
-            custom_total = box_price + ip.get("custom-materials", 0) + ip.get("custom-services", 0)
-            
-            box_data = {
-                "section": section,
-                "model": model,
-                "dimensions": dimensions_str,
-                "box_price": box_price,
-                "standard_materials": ip.get("standard-materials", 0),
-                "standard_services": ip.get("standard-services", 0),
-                "standard_total": standard_total,
-                "fragile_materials": ip.get("fragile-materials", 0),
-                "fragile_services": ip.get("fragile-services", 0),
-                "fragile_total": fragile_total,
-                "custom_materials": ip.get("custom-materials", 0),
-                "custom_services": ip.get("custom-services", 0),
-                "custom_total": custom_total,
-                "location": box.get("location", "???"),
-                "pricing_mode": "itemized"
-            }
-
-        result.append(box_data)
-
-    # Sort by section and then by model
-    result.sort(key=lambda x: (x["section"], x["model"]))
-
-    return result
+# Get boxes formatted for the editor with sections
+@app.get("/api/store/{store_id}/boxes_with_sections", response_class=JSONResponse)
+def get_boxes_with_sections(request: Request, store_id: str = Path(..., regex=r"^\d{1,4}$")):
+    # Rows are built and sorted by section and model when the store is compiled
+    return catalog_response(request, load_store_catalog(store_id), "boxes_with_sections")
 
 # Get all boxes at once (bulk endpoint)
 @app.get("/api/store/{store_id}/all_boxes", response_class=JSONResponse)
-async def get_all_boxes(store_id: str = Path(..., regex=r"^\d{1,4}$")):
-    data = load_store_yaml(store_id)
-    
-    # Add model field to all boxes that don't have it
-    for box in data["boxes"]:
-        if "model" not in box:
-            box["model"] = f"Unknown-{len(box['dimensions'])}-{box['dimensions'][0]}-{box['dimensions'][1]}-{box['dimensions'][2]}"
-    
-    return {"pricing_mode": data.get("pricing-mode", "standard"), "boxes": data["boxes"]}
+def get_all_boxes(request: Request, store_id: str = Path(..., regex=r"^\d{1,4}$")):
+    # Legacy boxes already carry their synthetic model in the snapshot
+    return catalog_response(request, load_store_catalog(store_id), "all_boxes")
 
 # Get a single box by model
 @app.get("/api/store/{store_id}/box/{model}", response_class=JSONResponse)
-async def get_box_by_model(
+def get_box_by_model(
+    response: Response,
     store_id: str = Path(..., regex=r"^\d{1,4}$"),
     model: str = Path(...)):
 
-    data = load_store_yaml(store_id)
-    pricing_mode = data.get("pricing-mode", "standard")
-
-    for box in data["boxes"]:
-        # Handle legacy format and compare with the provided model
-        box_model = box.get("model", f"Unknown-{len(box['dimensions'])}-{box['dimensions'][0]}-{box['dimensions'][1]}-{box['dimensions'][2]}")
-
-        if box_model == model:
-            # For legacy boxes, ensure all fields exist
-            if "model" not in box:
-                box["model"] = box_model
-            if "supplier" not in box:
-                box["supplier"] = "Unknown"
-            if "location" not in box:
-                box["location"] = "???"
-                
-            # Add pricing mode to the response
-            box["pricing_mode"] = pricing_mode
-            
-            return box
+    snapshot = load_store_catalog(store_id)
+    response.headers[CATALOG_VERSION_HEADER] = snapshot.version
+
+    box = snapshot.find(model)
+    if box is None:
+        raise HTTPException(status_code=404, detail=f"Box with model {model} not found")
+
+    # For legacy boxes, ensure all fields exist
+    box_data = dict(box.config)
+    box_data["model"] = box.model
+    box_data.setdefault("supplier", "Unknown")
+    box_data.setdefault("location", "???")
+
+    # Add pricing mode to the response
+    box_data["pricing_mode"] = snapshot.pricing_mode
+
+    return box_data
+
+# Validate packing filters and translate the result filter checkboxes into recomendation levels
+def get_pack_filters(levels: List[str], strategies: List[str], show_possible: bool,
+                     show_no_space: bool, show_impossible: bool) -> List[str]:
+    for level in levels:
+        if level not in packing.PACKING_LEVEL_NAMES:
+            raise HTTPException(status_code=400, detail=f"Unknown packing level: {level}")
+    for strategy in strategies:
+        if strategy not in packing.PACKING_STRATEGIES:
+            raise HTTPException(status_code=400, detail=f"Unknown packing strategy: {strategy}")
+
+    # Same result filter as the checkboxes on the packing page - "fits" is always shown
+    recomendations = ["fits"]
+    if show_possible:
+        recomendations.append("possible")
+    if show_no_space:
+        recomendations.append("no space")
+    if show_impossible:
+        recomendations.append("impossible")
+    return recomendations
+
+# Pack items through the result cache, evaluating only the items that miss
+def pack_cached(store_id: str, items: List[List[float]], levels: List[str], strategies: List[str],
+                recomendations: List[str], score_priority: bool, limit: Optional[int]):
+    version, catalog = load_box_catalog(store_id)
+    filters = (tuple(levels), tuple(strategies), tuple(recomendations), score_priority, limit)
+
+    # Dims are rounded to the 1/8" the packing page accepts, so near-identical inputs share an entry
+    quantized = [pack_cache.quantize(item) for item in items]
+    keys = [pack_cache.make_key(store_id, version, dims, filters) for dims in quantized]
+    results = [pack_cache.get(key) for key in keys]
+
+    misses = sorted({dims for dims, result in zip(quantized, results) if result is None})
+    if misses:
+        computed = dict(zip(misses, packing.pack_batch(catalog, misses, levels, strategies,
+                                                       recomendations, score_priority, limit)))
+        for i, dims in enumerate(quantized):
+            if results[i] is None:
+                results[i] = computed[dims]
+                pack_cache.put(keys[i], results[i])
+
+    return results
+
+# Largest item dimension (in inches) the pack endpoints accept. Anything bigger fits no box,
+# and huge values would overflow the scores.
+MAX_ITEM_DIM = 1000
+
+# Evaluate the store's boxes for an item server-side (same math as Box.gen_boxResults)
+@app.get("/api/store/{store_id}/pack", response_class=JSONResponse)
+def pack_item(
+    store_id: str = Path(..., regex=r"^\d{1,4}$"),
+    x: float = Query(..., ge=0, le=MAX_ITEM_DIM, allow_inf_nan=False),
+    y: float = Query(..., ge=0, le=MAX_ITEM_DIM, allow_inf_nan=False),
+    z: float = Query(..., ge=0, le=MAX_ITEM_DIM, allow_inf_nan=False),
+    levels: List[str] = Query(["Standard Pack"]),
+    strategies: List[str] = Query(["Normal"]),
+    show_possible: bool = True,
+    show_no_space: bool = False,
+    show_impossible: bool = False,
+    score_priority: bool = False,
+    limit: Optional[int] = Query(None, ge=1)):
+
+    recomendations = get_pack_filters(levels, strategies, show_possible, show_no_space, show_impossible)
+
+    # With a limit only the best `limit` rows are selected and sorted
+    results = pack_cached(store_id, [[x, y, z]], levels, strategies, recomendations, score_priority, limit)[0]
+
+    return {"results": results}
+
+# Define the request model for pricing a whole order at once
+class PackBatchRequest(BaseModel):
+    items: List[List[float]]
+    levels: List[str] = ["Standard Pack"]
+    strategies: List[str] = ["Normal"]
+    show_possible: bool = True
+    show_no_space: bool = False
+    show_impossible: bool = False
+    score_priority: bool = False
+    limit: int = 5
+
+MAX_BATCH_ITEMS = 200
+
+# Evaluate a list of items in one call and return the best results for each
+@app.post("/api/store/{store_id}/pack/batch", response_class=JSONResponse)
+def pack_batch(
+    store_id: str = Path(..., regex=r"^\d{1,4}$"),
+    batch: PackBatchRequest = Body(...)):
+
+    if not batch.items or len(batch.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch must contain between 1 and {MAX_BATCH_ITEMS} items")
+    for i, item in enumerate(batch.items):
+        # JSON allows NaN and Infinity (and 1e400 parses as inf), so check for finite numbers too
+        if len(item) != 3 or not all(math.isfinite(d) and 0 <= d <= MAX_ITEM_DIM for d in item):
+            raise HTTPException(status_code=400, detail=f"Item at index {i} must be a list of 3 numbers from 0 to {MAX_ITEM_DIM}")
+    if batch.limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+
+    recomendations = get_pack_filters(batch.levels, batch.strategies, batch.show_possible,
+                                      batch.show_no_space, batch.show_impossible)
 
-    raise HTTPException(status_code=404, detail=f"Box with model {model} not found")
+    # Cache misses are evaluated together as one (items x boxes) computation
+    results = pack_cached(store_id, batch.items, batch.levels, batch.strategies,
+                          recomendations, batch.score_priority, batch.limit)
+
+    return {"results": results}
 
 # Define the request model for price updates with CSRF protection
 class PriceUpdateRequest(BaseModel):
     changes: Dict[str, Dict[str, float]]
     csrf_token: str
+    expected_version: Optional[str] = None
 
 # Define the request model for itemized price updates
 class ItemizedPriceUpdateRequest(BaseModel):
     changes: Dict[str, Dict[str, float]]
     csrf_token: str
+    expected_version: Optional[str] = None
 
 # Update prices for multiple boxes (standard pricing mode)
 @app.post("/api/store/{store_id}/update_prices", response_class=JSONResponse)
-async def update_prices(
+def update_prices(
+    response: Response,
     store_id: str = Path(..., regex=r"^\d{1,4}$"),
     update_data: PriceUpdateRequest = Body(...),
+    if_match: Optional[str] = Header(None),
     auth_store_id: str = Depends(get_current_store)):
 
     # Extract data from the request
@@ -558,49 +648,54 @@ async def update_prices(
     if not update_data.csrf_token or len(update_data.csrf_token) < 10:
         raise HTTPException(status_code=403, detail="Invalid CSRF token")
 
-    data = load_store_yaml(store_id)
-    
-    # Check pricing mode
-    pricing_mode = data.get("pricing-mode", "standard")
-    if pricing_mode != "standard":
-        raise HTTPException(status_code=400, detail="This endpoint is for standard pricing mode only. Use /update_itemized_prices for itemized pricing.")
-
-    # Authentication check is handled by the auth_store_id dependency
-
-    updated_count = 0
-
-    # Update prices for each box in the changes dict
-    for box in data["boxes"]:
-        # Get the actual model or generate a default one for legacy boxes
-        box_model = box.get("model", f"Unknown-{len(box['dimensions'])}-{box['dimensions'][0]}-{box['dimensions'][1]}-{box['dimensions'][2]}")
-
-        if box_model in changes:
-            price_changes = changes[box_model]
-
-            for index, new_price in price_changes.items():
-                idx = int(index)
-                # Validate price - must be a positive number within a reasonable range
-                if 0 <= idx < 4 and isinstance(new_price, (int, float)) and 0 <= new_price <= 10000:
-                    box["prices"][idx] = new_price
-                    updated_count += 1
-                else:
-                    raise HTTPException(status_code=400, detail=f"Invalid price value: {new_price}. Prices must be between 0 and 10000.")
+    # Hold the store's write lock across load -> modify -> save so concurrent edits aren't lost
+    with store_write_lock(store_id):
+        data, snapshot = load_store_for_update(store_id)
+        check_catalog_version(snapshot, if_match, update_data.expected_version)
+    
+        # Check pricing mode
+        pricing_mode = snapshot.pricing_mode
+        if pricing_mode != "standard":
+            raise HTTPException(status_code=400, detail="This endpoint is for standard pricing mode only. Use /update_itemized_prices for itemized pricing.")
+
+        # Authentication check is handled by the auth_store_id dependency
+
+        updated_count = 0
+        touched = []
+
+        # Update prices for each box in the changes dict, found through the model index
+        for box_model, price_changes in changes.items():
+            for position in snapshot.model_index.get(box_model, ()):
+                box = data["boxes"][position]
+                touched.append(position)
+
+                for index, new_price in price_changes.items():
+                    idx = int(index)
+                    # Validate price - must be a positive number within a reasonable range
+                    if 0 <= idx < 4 and isinstance(new_price, (int, float)) and 0 <= new_price <= 10000:
+                        box["prices"][idx] = new_price
+                        updated_count += 1
+                    else:
+                        raise HTTPException(status_code=400, detail=f"Invalid price value: {new_price}. Prices must be between 0 and 10000.")
 
-            # If this is a legacy box and we're updating it, add the model field
-            # so we can reference it again in the future
-            if "model" not in box:
-                box["model"] = box_model
+                # If this is a legacy box and we're updating it, add the model field
+                # so we can reference it again in the future
+                if "model" not in box:
+                    box["model"] = box_model
 
-    # Save the updated YAML file
-    save_store_yaml(store_id, data)
+        # Save the changes and hand the new version back for the next edit
+        commit_store_changes(store_id, data, snapshot, touched, auth_store_id)
+        response.headers[CATALOG_VERSION_HEADER] = load_store_catalog(store_id).version
 
     return {"message": f"Updated {updated_count} prices successfully"}
 
 # Update itemized prices for multiple boxes (itemized pricing mode)
 @app.post("/api/store/{store_id}/update_itemized_prices", response_class=JSONResponse)
-async def update_itemized_prices(
+def update_itemized_prices(
+    response: Response,
     store_id: str = Path(..., regex=r"^\d{1,4}$"),
     update_data: ItemizedPriceUpdateRequest = Body(...),
+    if_match: Optional[str] = Header(None),
     auth_store_id: str = Depends(get_current_store)):
 
     # Extract data from the request
@@ -611,53 +706,56 @@ async def update_itemized_prices(
     if not update_data.csrf_token or len(update_data.csrf_token) < 10:
         raise HTTPException(status_code=403, detail="Invalid CSRF token")
 
-    data = load_store_yaml(store_id)
+    # Hold the store's write lock across load -> modify -> save so concurrent edits aren't lost
+    with store_write_lock(store_id):
+        data, snapshot = load_store_for_update(store_id)
+        check_catalog_version(snapshot, if_match, update_data.expected_version)
     
-    # Check pricing mode
-    pricing_mode = data.get("pricing-mode", "standard")
-    if pricing_mode != "itemized":
-        raise HTTPException(status_code=400, detail="This endpoint is for itemized pricing mode only. Use /update_prices for standard pricing.")
-
-    # Authentication check is handled by the auth_store_id dependency
+        # Check pricing mode
+        pricing_mode = snapshot.pricing_mode
+        if pricing_mode != "itemized":
+            raise HTTPException(status_code=400, detail="This endpoint is for itemized pricing mode only. Use /update_prices for standard pricing.")
 
-    updated_count = 0
+        # Authentication check is handled by the auth_store_id dependency
 
-    # Update prices for each box in the changes dict
-    for box in data["boxes"]:
-        # Get the actual model or generate a default one for legacy boxes
-        box_model = box.get("model", f"Unknown-{len(box['dimensions'])}-{box['dimensions'][0]}-{box['dimensions'][1]}-{box['dimensions'][2]}")
+        updated_count = 0
+        touched = []
 
-        if box_model in changes:
-            price_changes = changes[box_model]
+        # Update prices for each box in the changes dict, found through the model index
+        for box_model, price_changes in changes.items():
+            for position in snapshot.model_index.get(box_model, ()):
+                box = data["boxes"][position]
+                touched.append(position)
             
-            # Ensure itemized-prices exists
-            if "itemized-prices" not in box:
-                box["itemized-prices"] = {
-                    "box-price": 0,
-                    "standard-materials": 0,
-                    "standard-services": 0,
-                    "fragile-materials": 0,
-                    "fragile-services": 0,
-                    "custom-materials": 0,
-                    "custom-services": 0
-                }
-
-            # Apply changes to appropriate fields
-            for field, new_price in price_changes.items():
-                # Validate price - must be a positive number within a reasonable range
-                if isinstance(new_price, (int, float)) and 0 <= new_price <= 10000:
-                    box["itemized-prices"][field] = new_price
-                    updated_count += 1
-                else:
-                    raise HTTPException(status_code=400, detail=f"Invalid price value: {new_price}. Prices must be between 0 and 10000.")
+                # Ensure itemized-prices exists
+                if "itemized-prices" not in box:
+                    box["itemized-prices"] = {
+                        "box-price": 0,
+                        "standard-materials": 0,
+                        "standard-services": 0,
+                        "fragile-materials": 0,
+                        "fragile-services": 0,
+                        "custom-materials": 0,
+                        "custom-services": 0
+                    }
+
+                # Apply changes to appropriate fields
+                for field, new_price in price_changes.items():
+                    # Validate price - must be a positive number within a reasonable range
+                    if isinstance(new_price, (int, float)) and 0 <= new_price <= 10000:
+                        box["itemized-prices"][field] = new_price
+                        updated_count += 1
+                    else:
+                        raise HTTPException(status_code=400, detail=f"Invalid price value: {new_price}. Prices must be between 0 and 10000.")
 
-            # If this is a legacy box and we're updating it, add the model field
-            # so we can reference it again in the future
-            if "model" not in box:
-                box["model"] = box_model
+                # If this is a legacy box and we're updating it, add the model field
+                # so we can reference it again in the future
+                if "model" not in box:
+                    box["model"] = box_model
 
-    # Save the updated YAML file
-    save_store_yaml(store_id, data)
+        # Save the changes and hand the new version back for the next edit
+        commit_store_changes(store_id, data, snapshot, touched, auth_store_id)
+        response.headers[CATALOG_VERSION_HEADER] = load_store_catalog(store_id).version
 
     return {"message": f"Updated {updated_count} itemized prices successfully"}
 
@@ -665,7 +763,7 @@ class Comment(BaseModel):
     text: str
 
 @app.post("/comments")
-async def save_comment(comment: Comment):
+def save_comment(comment: Comment):
     with open("comments.txt", "a") as f:
         f.write(comment.text + "\n")
 
@@ -684,26 +782,32 @@ async def login(
     login_data: LoginRequest = Body(...)
 ):
     # Check if store exists
-    yaml_file = f"stores/store{store_id}.yml"
-    if not os.path.exists(yaml_file):
+    if not await run_in_threadpool(stores.exists, store_id):
         raise HTTPException(status_code=404, detail=f"Store not found: {store_id}")
     
     # Check if store has authentication enabled
-    if not store_has_auth(store_id):
+    password_hash = await run_in_threadpool(get_password_hash, store_id)
+    if not password_hash:
         raise HTTPException(status_code=400, detail=f"Authentication not enabled for store {store_id}")
     
-    # Verify password
-    if not verify_store_password(store_id, login_data.password):
+    # Verify password on the bcrypt pool; no request thread waits on it, and when the pool is
+    # saturated the login is turned away instead of slowing down everything else
+    try:
+        is_valid = await asyncio.wrap_future(check_password(login_data.password, password_hash))
+    except AuthBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
+    await run_in_threadpool(log_login_attempt, store_id, is_valid)
+    if not is_valid:
         raise HTTPException(status_code=401, detail="Invalid password")
     
     # Create session (token)
     token_duration = 30 * 24 if login_data.remember_me else 24  # 30 days or 24 hours
-    token = create_session(store_id, hours=token_duration)
+    token = await run_in_threadpool(create_session, store_id, hours=token_duration)
     
     return {"token": token}
 
 @app.get("/api/store/{store_id}/verify")
-async def verify_token(
+def verify_token(
     store_id: str = Path(..., regex=r"^\d{1,4}$"),
     auth_store_id: str = Depends(get_current_store)
 ):
@@ -715,10 +819,9 @@ async def verify_token(
     return {"verified": True, "store_id": store_id}
 
 @app.get("/api/store/{store_id}/has-auth")
-async def check_has_auth(store_id: str = Path(..., regex=r"^\d{1,4}$")):
-    # Check if the store's YAML file exists
-    yaml_file = f"stores/store{store_id}.yml"
-    if not os.path.exists(yaml_file):
+def check_has_auth(store_id: str = Path(..., regex=r"^\d{1,4}$")):
+    # Check if the store exists
+    if not stores.exists(store_id):
         raise HTTPException(status_code=404, detail=f"Store not found: {store_id}")
     
     # Check if auth is enabled
@@ -727,18 +830,19 @@ async def check_has_auth(store_id: str = Path(..., regex=r"^\d{1,4}$")):
     return {"hasAuth": has_auth}
 
 @app.post("/api/store/{store_id}/logout")
-async def logout(
+def logout(
     store_id: str = Path(..., regex=r"^\d{1,4}$"),
-    token: str = Depends(get_current_store)
+    auth_store_id: str = Depends(get_current_store),
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
 ):
-    # Delete the session token
-    delete_session(token)
+    # Delete the session token itself; get_current_store only returns the store ID
+    delete_session(credentials.credentials)
     
     return {"message": "Logged out successfully"}
 
 # Floorplan endpoints
 @app.get("/api/store/{store_id}/floorplan", response_class=FileResponse)
-async def get_floorplan(store_id: str = Path(..., regex=r"^\d{1,4}$")):
+def get_floorplan(store_id: str = Path(..., regex=r"^\d{1,4}$")):
     # Check for existing floorplan files in expected formats
     floorplan_dir = "assets/floorplans"
     extensions = ['.png', '.jpg', '.jpeg', '.svg']
@@ -763,6 +867,34 @@ async def get_floorplan(store_id: str = Path(..., regex=r"^\d{1,4}$")):
     # No floorplan found
     raise HTTPException(status_code=404, detail=f"No floorplan found for store {store_id}")
 
+# Replace a store's floorplan image and clear its box locations, returning how many were cleared
+def replace_floorplan(store_id: str, floorplan_dir: str, filename: str, contents: bytes) -> int:
+    # Locations are relative to the old image, so both change under the store's write lock
+    with store_write_lock(store_id):
+        # Remove any existing floorplans for this store
+        for existing_file in os.listdir(floorplan_dir):
+            if existing_file.startswith(f"store{store_id}"):
+                os.remove(os.path.join(floorplan_dir, existing_file))
+
+        with atomic_write(os.path.join(floorplan_dir, filename), "wb") as f:
+            f.write(contents)
+
+        # Clear all location coordinates for this store
+        data = load_store_yaml(store_id)
+        locations_cleared = 0
+
+        for box in data["boxes"]:
+            if "location" in box:
+                # Remove location completely instead of setting to empty dict
+                del box["location"]
+                locations_cleared += 1
+
+        # Save the updated YAML if any locations were cleared
+        if locations_cleared > 0:
+            save_store_yaml(store_id, data)
+
+    return locations_cleared
+
 @app.post("/api/store/{store_id}/floorplan")
 async def upload_floorplan(
     store_id: str = Path(..., regex=r"^\d{1,4}$"),
@@ -795,34 +927,10 @@ async def upload_floorplan(
     elif file.content_type == "image/svg+xml":
         extension = ".svg"
     
-    # Remove any existing floorplans for this store
+    # Save the new floorplan with simplified naming, off the event loop
     floorplan_dir = "assets/floorplans"
-    existing_files = os.listdir(floorplan_dir)
-    for existing_file in existing_files:
-        if existing_file.startswith(f"store{store_id}"):
-            os.remove(os.path.join(floorplan_dir, existing_file))
-    
-    # Save the new floorplan with simplified naming
     filename = f"store{store_id}_floor{extension}"
-    file_path = os.path.join(floorplan_dir, filename)
-    
-    # Save file asynchronously
-    async with aiofiles.open(file_path, 'wb') as f:
-        await f.write(contents)
-    
-    # Clear all location coordinates for this store
-    data = load_store_yaml(store_id)
-    locations_cleared = 0
-    
-    for box in data["boxes"]:
-        if "location" in box:
-            # Remove location completely instead of setting to empty dict
-            del box["location"]
-            locations_cleared += 1
-    
-    # Save the updated YAML if any locations were cleared
-    if locations_cleared > 0:
-        save_store_yaml(store_id, data)
+    locations_cleared = await run_in_threadpool(replace_floorplan, store_id, floorplan_dir, filename, contents)
     
     return {
         "message": f"Floorplan uploaded successfully for store {store_id}",
@@ -834,91 +942,78 @@ async def upload_floorplan(
 
 # Get all box locations for mapping
 @app.get("/api/store/{store_id}/box-locations", response_class=JSONResponse)
-async def get_box_locations(store_id: str = Path(..., regex=r"^\d{1,4}$")):
-    data = load_store_yaml(store_id)
-    
-    locations = []
-    for box in data["boxes"]:
-        model = box.get("model", f"Unknown-{len(box['dimensions'])}-{box['dimensions'][0]}-{box['dimensions'][1]}-{box['dimensions'][2]}")
-        
-        location_data = {
-            "model": model,
-            "dimensions": box["dimensions"],
-            "type": box.get("type", "NormalBox")
-        }
-        
-        # Get location data
-        if "location" in box and isinstance(box["location"], dict) and "coords" in box["location"] and box["location"]["coords"]:
-            # Standard dictionary format with valid coords
-            location_data["coords"] = box["location"]["coords"]
-            # We're not using labels anymore, but maintain API compatibility with empty string
-            location_data["label"] = ""
-        elif "location" in box and isinstance(box["location"], str) and box["location"].strip():
-            # For backwards compatibility, but we'll return empty label
-            location_data["label"] = ""
-            location_data["coords"] = None
-        else:
-            # No location, empty location or invalid location
-            location_data["label"] = ""
-            location_data["coords"] = None
-            
-        locations.append(location_data)
-    
-    return locations
+def get_box_locations(request: Request, store_id: str = Path(..., regex=r"^\d{1,4}$")):
+    return catalog_response(request, load_store_catalog(store_id), "box-locations")
 
 # Update box locations (bulk)
 class LocationUpdateRequest(BaseModel):
     changes: Dict[str, Union[Dict[str, Any], None]]
     csrf_token: str
+    expected_version: Optional[str] = None
 
 @app.post("/api/store/{store_id}/update-locations", response_class=JSONResponse)
-async def update_locations(
+def update_locations(
+    response: Response,
     store_id: str = Path(..., regex=r"^\d{1,4}$"),
     update_data: LocationUpdateRequest = Body(...),
+    if_match: Optional[str] = Header(None),
     auth_store_id: str = Depends(get_current_store)):
     
     # Validate CSRF token
     if not update_data.csrf_token or len(update_data.csrf_token) < 10:
         raise HTTPException(status_code=403, detail="Invalid CSRF token")
     
-    data = load_store_yaml(store_id)
-    
-    # Authentication check is handled by the auth_store_id dependency
-    
-    updated_count = 0
-    
-    # Update locations for each box in the changes dict
-    for box in data["boxes"]:
-        box_model = box.get("model", f"Unknown-{len(box['dimensions'])}-{box['dimensions'][0]}-{box['dimensions'][1]}-{box['dimensions'][2]}")
-        
-        if box_model in update_data.changes:
-            location_change = update_data.changes[box_model]
+    # Hold the store's write lock across load -> modify -> save so concurrent edits aren't lost
+    with store_write_lock(store_id):
+        data, snapshot = load_store_for_update(store_id)
+        check_catalog_version(snapshot, if_match, update_data.expected_version)
+    
+        # Authentication check is handled by the auth_store_id dependency
+    
+        updated_count = 0
+        touched = []
+    
+        # Update locations for each box in the changes dict, found through the model index
+        for box_model, location_change in update_data.changes.items():
+            # Reject bad coordinates before anything is saved; a stored one would fail validation
+            # and break every read of the store
+            if isinstance(location_change, dict) and location_change.get("coords") \
+                    and not catalog.valid_coords(location_change["coords"]):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid coordinates for {box_model}: must be a list of 2 numbers"
+                )
+
+            for position in snapshot.model_index.get(box_model, ()):
+                box = data["boxes"][position]
+                touched.append(position)
             
-            if location_change is None:
-                # Clear location by removing it completely
-                if "location" in box:
-                    del box["location"]
-            else:
-                # Make sure changes are in dictionary format
-                if isinstance(location_change, dict):
-                    # Standard dictionary format
-                    if "coords" not in location_change or not location_change["coords"]:
-                        # No coordinates case - remove location
-                        if "location" in box:
-                            del box["location"]
-                    else:
-                        # Full location with coordinates
-                        box["location"] = {
-                            "coords": location_change["coords"]
-                        }
-                else:
-                    # If non-dictionary was sent (shouldn't happen), remove location
+                if location_change is None:
+                    # Clear location by removing it completely
                     if "location" in box:
                         del box["location"]
+                else:
+                    # Make sure changes are in dictionary format
+                    if isinstance(location_change, dict):
+                        # Standard dictionary format
+                        if "coords" not in location_change or not location_change["coords"]:
+                            # No coordinates case - remove location
+                            if "location" in box:
+                                del box["location"]
+                        else:
+                            # Full location with coordinates
+                            box["location"] = {
+                                "coords": location_change["coords"]
+                            }
+                    else:
+                        # If non-dictionary was sent (shouldn't happen), remove location
+                        if "location" in box:
+                            del box["location"]
             
-            updated_count += 1
+                updated_count += 1
     
-    # Save the updated YAML file
-    save_store_yaml(store_id, data)
+        # Save the changes and hand the new version back for the next edit
+        commit_store_changes(store_id, data, snapshot, touched, auth_store_id)
+        response.headers[CATALOG_VERSION_HEADER] = load_store_catalog(store_id).version
     
     return {"message": f"Updated {updated_count} locations successfully"}
\ No newline at end of file
@@ -19,6 +19,9 @@ Examples:
     ./tools/auth list
     ./tools/auth verify 1
     ./tools/auth audit
+    ./tools/auth sessions
+    ./tools/auth audit --daily
+    ./tools/auth rollup
     
 Note: This tool should be run inside the Docker container. The convenience script
 ./tools/auth handles this automatically.
@@ -36,7 +39,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from lib.auth_manager import (
     init_db, create_store_auth, list_stores, 
-    get_audit_log, verify_store_password
+    get_audit_log, verify_store_password,
+    count_live_sessions, sweep_expired_sessions,
+    get_audit_summary, rollup_audit_log, AUDIT_RETENTION_DAYS
 )
 
 def cmd_init(args):
@@ -143,6 +148,10 @@ def cmd_verify(args):
 
 def cmd_audit(args):
     """Show audit log"""
+    if args.daily:
+        cmd_audit_daily(args)
+        return
+    
     logs = get_audit_log(store_id=args.store, limit=args.limit)
     
     if not logs:
@@ -162,6 +171,42 @@ def cmd_audit(args):
     headers = ['Timestamp', 'Store', 'Action', 'Details']
     print(tabulate(table_data, headers=headers, tablefmt='grid'))
 
+def cmd_audit_daily(args):
+    """Show daily audit event counts"""
+    rows = get_audit_summary(store_id=args.store, limit=args.limit)
+    
+    if not rows:
+        print("No daily audit counts found.")
+        return
+    
+    table_data = [[row['day'], row['store_id'], row['action'], row['count']] for row in rows]
+    
+    headers = ['Day', 'Store', 'Action', 'Count']
+    print(tabulate(table_data, headers=headers, tablefmt='grid'))
+
+def cmd_rollup(args):
+    """Roll old audit log entries into daily counts"""
+    rolled_up = rollup_audit_log(retention_days=args.days)
+    print(f"Rolled {rolled_up} audit log entries older than {args.days} days into daily counts.")
+
+def cmd_sessions(args):
+    """Show live sessions per store"""
+    if args.sweep:
+        deleted = sweep_expired_sessions()
+        print(f"Removed {deleted} expired sessions.")
+    
+    counts = count_live_sessions()
+    
+    if not counts:
+        print("No live sessions.")
+        return
+    
+    table_data = [[store_id, count] for store_id, count in counts.items()]
+    table_data.append(['Total', sum(counts.values())])
+    
+    headers = ['Store ID', 'Live sessions']
+    print(tabulate(table_data, headers=headers, tablefmt='grid'))
+
 def main():
     parser = argparse.ArgumentParser(
         description='Manage store authentication for Packing Website'
@@ -225,8 +270,35 @@ def main():
         default=50,
         help='Number of entries to show (default: 50)'
     )
+    parser_audit.add_argument(
+        '-d', '--daily',
+        action='store_true',
+        help='Show daily counts of rolled-up entries instead'
+    )
     parser_audit.set_defaults(func=cmd_audit)
     
+    # rollup command
+    parser_rollup = subparsers.add_parser(
+        'rollup',
+        help='Roll old audit log entries into daily counts'
+    )
+    parser_rollup.add_argument(
+        '--days',
+        type=int,
+        default=AUDIT_RETENTION_DAYS,
+        help=f'Keep entries newer than this many days (default: {AUDIT_RETENTION_DAYS})'
+    )
+    parser_rollup.set_defaults(func=cmd_rollup)
+    
+    # sessions command
+    parser_sessions = subparsers.add_parser('sessions', help='Show live sessions per store')
+    parser_sessions.add_argument(
+        '--sweep',
+        action='store_true',
+        help='Delete expired sessions first'
+    )
+    parser_sessions.set_defaults(func=cmd_sessions)
+    
     # Parse arguments
     args = parser.parse_args()
     
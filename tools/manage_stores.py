@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Store Catalog Management Tool
+
+Moves store catalogs between the YAML files in stores/ and the SQLite
+catalog tables used with STORE_BACKEND=sqlite:
+- Importing store files into the database
+- Exporting stores from the database back to store files
+- Listing the stores in each backend
+
+Stores are copied whole, journals included, and an existing copy on the
+other side is replaced. Stop the site (or make sure nobody is editing) while
+moving stores, or edits made in the meantime end up in only one backend.
+
+Examples:
+    # Using the convenience script (runs inside Docker):
+    ./tools/stores import          # every stores/store*.yml
+    ./tools/stores import 1 2
+    ./tools/stores export 2
+    ./tools/stores list
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path so we can import lib modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from tabulate import tabulate
+from lib.store_backend import YamlBackend, SqliteBackend
+
+def copy_stores(source, target, store_ids):
+    """Copy stores from one backend to another"""
+    if not store_ids:
+        store_ids = source.store_ids()
+        if not store_ids:
+            print(f"No stores found in the {source.name} backend.")
+            return
+
+    failed = False
+    for store_id in store_ids:
+        try:
+            _, data = source.read(store_id)
+            target.write(store_id, data)
+        except FileNotFoundError:
+            print(f"Error: {source.describe(store_id)} not found!")
+            failed = True
+            continue
+        except Exception as e:
+            print(f"Error copying store {store_id}: {str(e)}")
+            failed = True
+            continue
+        print(f"Copied store {store_id} ({len(data['boxes'])} boxes) to {target.describe(store_id)}")
+
+    if failed:
+        sys.exit(1)
+
+def cmd_import(args):
+    """Import store files into the database"""
+    target = SqliteBackend()
+    target.init()
+    copy_stores(YamlBackend(), target, args.stores)
+
+def cmd_export(args):
+    """Export stores from the database to store files"""
+    source = SqliteBackend()
+    source.init()
+    copy_stores(source, YamlBackend(), args.stores)
+
+def cmd_list(args):
+    """List the stores in both backends"""
+    yaml_ids = set(YamlBackend().store_ids())
+    database = SqliteBackend()
+    database.init()
+    sqlite_ids = set(database.store_ids())
+
+    if not yaml_ids and not sqlite_ids:
+        print("No stores found.")
+        return
+
+    table_data = []
+    for store_id in sorted(yaml_ids | sqlite_ids, key=int):
+        table_data.append([
+            store_id,
+            'yes' if store_id in yaml_ids else '',
+            database.stamp(store_id) or ''
+        ])
+
+    headers = ['Store ID', 'YAML file', 'Database revision']
+    print(tabulate(table_data, headers=headers, tablefmt='grid'))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Move store catalogs between YAML files and SQLite for Packing Website'
+    )
+    subparsers = parser.add_subparsers(dest='command', help='Commands')
+
+    # import command
+    parser_import = subparsers.add_parser(
+        'import',
+        help='Import store files into the database'
+    )
+    parser_import.add_argument('stores', nargs='*', help='Store IDs (default: every store file)')
+    parser_import.set_defaults(func=cmd_import)
+
+    # export command
+    parser_export = subparsers.add_parser(
+        'export',
+        help='Export stores from the database to store files'
+    )
+    parser_export.add_argument('stores', nargs='*', help='Store IDs (default: every store in the database)')
+    parser_export.set_defaults(func=cmd_export)
+
+    # list command
+    parser_list = subparsers.add_parser('list', help='List stores in both backends')
+    parser_list.set_defaults(func=cmd_list)
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        sys.exit(1)
+
+    # Execute the command
+    args.func(args)
+
+if __name__ == "__main__":
+    main()